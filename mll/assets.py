@@ -0,0 +1,520 @@
+"""Image assets for the presentation.
+
+Decoding images is the slowest thing the deck does outside of rasterization,
+so everything that reads pixels from disk goes through this module.
+"""
+from manim import DEFAULT_QUALITY, QUALITIES, ImageMobject, config, logger
+from manim.utils.bezier import interpolate
+from manim.utils.images import change_to_rgba_array, get_full_raster_image_path
+
+import ast
+import collections
+import concurrent.futures
+import hashlib
+import io
+import math
+import os
+import sys
+import threading
+
+import numpy as np
+from PIL import Image
+
+from profiling import profiler
+from rendering import extra_resolutions
+
+cache_dir = "cache"
+# decoded pixels kept in memory across the whole deck, in bytes
+asset_cache_budget = 256 * 2 ** 20
+# threads decoding the images of upcoming scenes
+prefetch_workers = 4
+
+
+def file_signature(paths):
+    # cheap fingerprint of a set of files, good enough to invalidate caches
+    signature = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        signature.update("{}:{}:{}".format(path, stat.st_size, stat.st_mtime_ns).encode())
+    return signature.hexdigest()
+
+
+def content_hash(path):
+    if os.path.isdir(path):
+        return file_signature(list_frames(path))
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def list_frames(directory):
+    return sorted(os.path.join(directory, x) for x in os.listdir(directory))
+
+
+class AssetCache:
+    """Decoded images keyed by content hash, evicted least recently used first.
+
+    The cached pixel arrays are read-only so that every mobject loading the same
+    file can share them. The cache may be filled from several threads; a file
+    being decoded by one thread is waited for, not decoded again.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.entries = collections.OrderedDict()
+        self.sources = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def source_info(self, path):
+        # content hash and (width, height) of a source image
+        stat = os.stat(path)
+        signature = (path, stat.st_size, stat.st_mtime_ns)
+        if signature not in self.sources:
+            with open(path, "rb") as f:
+                data = f.read()
+            self.sources[signature] = (hashlib.sha1(data).hexdigest(),
+                Image.open(io.BytesIO(data)).size)
+        return self.sources[signature]
+
+    def get(self, path, height=None):
+        """Returns the pixels of `path`, downscaled to `height` rows if given."""
+        content_hash, (_, source_height) = self.source_info(path)
+        if height is not None and height >= source_height:
+            height = None
+        key = (content_hash, height)
+
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            loading = self.loading.get(key)
+            if loading is None:
+                self.misses += 1
+                self.loading[key] = threading.Event()
+        if loading is not None:
+            loading.wait()
+            return self.get(path, height)
+
+        try:
+            with profiler.timed("images"):
+                if height is None:
+                    pixels = np.array(Image.open(path).convert("RGBA"))
+                    pixels.setflags(write=False)
+                else:
+                    pixels = np.load(resized_image(path, content_hash, height), mmap_mode="r")
+            with self.lock:
+                self.entries[key] = pixels
+                self.size += pixels.nbytes
+                while self.size > self.budget and len(self.entries) > 1:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= evicted.nbytes
+        finally:
+            with self.lock:
+                self.loading.pop(key).set()
+        return pixels
+
+    def spill(self):
+        """Moves the pixels decoded in memory to .npy files in the cache
+        directory and maps them back, so that the kernel may page them out."""
+        with self.lock:
+            for key, pixels in list(self.entries.items()):
+                if isinstance(pixels, np.memmap):
+                    continue
+                content_hash, _ = key
+                spilled_path = os.path.join(cache_dir, "{}-full.npy".format(content_hash))
+                if not os.path.exists(spilled_path):
+                    os.makedirs(cache_dir, exist_ok=True)
+                    tmp_path = "{}.{}.tmp.npy".format(spilled_path, os.getpid())
+                    np.save(tmp_path, pixels)
+                    os.replace(tmp_path, spilled_path)
+                self.entries[key] = np.load(spilled_path, mmap_mode="r")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+asset_cache = AssetCache(asset_cache_budget)
+
+
+def resized_image(path, content_hash, height):
+    """Path of a cached copy of `path` downscaled to `height` rows."""
+    resized_path = os.path.join(cache_dir, "{}-{}.npy".format(content_hash, height))
+    if not os.path.exists(resized_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        image = Image.open(path).convert("RGBA")
+        width = max(int(round(image.width * height / image.height)), 1)
+        image = image.resize((width, height), resample=Image.LANCZOS)
+        # unique per process, several renders may share the cache
+        tmp_path = "{}.{}.tmp.npy".format(resized_path, os.getpid())
+        np.save(tmp_path, np.array(image))
+        os.replace(tmp_path, resized_path)
+    return resized_path
+
+
+def screen_height(source_height, scale_to_resolution, pixel_height, zoom=1):
+    # rows the image covers on a frame `pixel_height` pixels tall, before any
+    # scaling done by the scene itself
+    return int(math.ceil(zoom * source_height * pixel_height / scale_to_resolution))
+
+
+def cached_pixels(filename, scale_to_resolution, zoom=1):
+    """(path, source height, pixels) of `filename` as shown at the current quality."""
+    path = str(get_full_raster_image_path(filename))
+    _, (_, source_height) = asset_cache.source_info(path)
+    # sharp enough for the tallest of the outputs
+    pixel_height = max([config["pixel_height"]] + [height for _, height in extra_resolutions])
+    pixels = asset_cache.get(path, screen_height(source_height, scale_to_resolution,
+        pixel_height, zoom))
+    return path, source_height, pixels
+
+
+class CachedImageMobject(ImageMobject):
+    """An ImageMobject whose pixels come from the asset cache.
+
+    The pixels are shared with every other mobject of the same file and only
+    copied when this mobject is about to modify them. Images larger than they
+    can appear at the current quality are loaded from a downscaled copy, with
+    `scale_to_resolution` adjusted so that they keep the same size on screen.
+    Pass `zoom` for images that are shown magnified. A transform between two
+    images loaded at different heights blends them at the taller one.
+
+    Images shown smaller than that, while shrinking for instance, are drawn
+    from a mipmap: a pyramid of copies, each half the size of the one above,
+    built on first use and shared like the pixels. The renderer sets
+    `screen_rows` to the rows the image covers before drawing it.
+    """
+
+    def __init__(self, filename, zoom=1,
+            scale_to_resolution=QUALITIES[DEFAULT_QUALITY]["pixel_height"],
+            invert=False, image_mode="RGBA", **kwargs):
+        path, source_height, pixels = cached_pixels(filename, scale_to_resolution, zoom)
+        scale_to_resolution *= pixels.shape[0] / source_height
+        if invert or image_mode != "RGBA":
+            # a copy of its own, as ImageMobject would have made of the file
+            pixels = change_to_rgba_array(
+                np.array(Image.fromarray(np.asarray(pixels)).convert(image_mode)))
+            if invert:
+                pixels[:, :, :3] = 255 - pixels[:, :, :3]
+        # before ImageMobject.__init__, whose reset_points reads the pixel array
+        self.mipmaps = []
+        self.screen_rows = None
+        # (pixels, resampled pixels) of the ends of the last transform
+        self.resampled_ends = []
+        # start from a placeholder so the cached pixels are shared, not copied
+        super().__init__(np.zeros((1, 1, 4), dtype=np.uint8),
+            scale_to_resolution=scale_to_resolution, image_mode=image_mode, **kwargs)
+        self.invert = invert
+        self.pixel_array = pixels
+        self.path = path
+        self.reset_points()
+
+    def own_pixels(self):
+        if not self.pixel_array.flags.writeable:
+            self.pixel_array = np.array(self.pixel_array)
+            self.mipmaps = []
+        return self.pixel_array
+
+    def mipmap(self, depth):
+        # level `depth + 1` of the pyramid, the shared pixels being level 0
+        while len(self.mipmaps) <= depth:
+            above = self.mipmaps[-1] if self.mipmaps else self.pixel_array
+            with profiler.timed("images"):
+                # premultiplied, so that transparent pixels do not bleed their color
+                image = Image.fromarray(np.asarray(above)).convert("RGBa")
+                level = np.array(image.reduce(2).convert("RGBA"))
+            level.setflags(write=False)
+            self.mipmaps.append(level)
+        return self.mipmaps[depth]
+
+    def get_pixel_array(self):
+        # pixels modified by this mobject change every frame, a pyramid of them would not pay off
+        if self.screen_rows is None or self.pixel_array.flags.writeable:
+            return self.pixel_array
+        # the smallest level still at least as tall as the image on screen,
+        # which the camera then shrinks by less than half
+        level, depth = self.pixel_array, 0
+        while level.shape[0] >= 2 * max(self.screen_rows, 1) and min(level.shape[:2]) >= 2:
+            level = self.mipmap(depth)
+            depth += 1
+        return level
+
+    def set_color(self, color, alpha=None, family=True):
+        self.own_pixels()
+        return super().set_color(color, alpha, family)
+
+    def set_opacity(self, alpha):
+        self.own_pixels()
+        return super().set_opacity(alpha)
+
+    def interpolate_color(self, mobject1, mobject2, alpha):
+        # at either end of an animation, go back to sharing the cached pixels
+        end = mobject2 if alpha == 1 else mobject1 if alpha == 0 else None
+        if end is None or end.pixel_array.flags.writeable:
+            return self.interpolate_pixels(mobject1, mobject2, alpha)
+        self.fill_opacity = end.fill_opacity
+        self.stroke_opacity = end.stroke_opacity
+        self.pixel_array = end.pixel_array
+        self.mipmaps = end.mipmaps
+        self.resampled_ends = []
+
+    def interpolate_pixels(self, mobject1, mobject2, alpha):
+        pixels1, pixels2 = mobject1.pixel_array, mobject2.pixel_array
+        if pixels1.shape == pixels2.shape:
+            return super().interpolate_color(mobject1, mobject2, alpha)
+        # the ends were loaded at different heights, blend them at the taller one
+        shape = max(pixels1.shape, pixels2.shape)
+        pixels1, pixels2 = self.resampled(pixels1, shape), self.resampled(pixels2, shape)
+        self.fill_opacity = interpolate(mobject1.fill_opacity, mobject2.fill_opacity, alpha)
+        self.stroke_opacity = interpolate(mobject1.stroke_opacity, mobject2.stroke_opacity, alpha)
+        self.pixel_array = interpolate(pixels1, pixels2, alpha).astype(self.pixel_array_dtype)
+
+    def resampled(self, pixels, shape):
+        if pixels.shape == shape:
+            return pixels
+        for source, result in self.resampled_ends:
+            if source is pixels and result.shape == shape:
+                return result
+        with profiler.timed("images"):
+            image = Image.fromarray(np.asarray(pixels)).resize((shape[1], shape[0]),
+                resample=Image.LANCZOS)
+            result = np.array(image)
+        # both ends of the transform, for every frame of it
+        self.resampled_ends = self.resampled_ends[-1:] + [(pixels, result)]
+        return result
+
+    def __deepcopy__(self, clone_from_id):
+        if not self.pixel_array.flags.writeable:
+            clone_from_id[id(self.pixel_array)] = self.pixel_array
+            # copies fill the same pyramid
+            clone_from_id[id(self.mipmaps)] = self.mipmaps
+        clone_from_id[id(self.resampled_ends)] = self.resampled_ends
+        return super().__deepcopy__(clone_from_id)
+
+
+def load_image(filename, **kwargs):
+    return CachedImageMobject(filename, **kwargs)
+
+
+def asset_calls(script):
+    """(scene, call, first argument, keyword arguments) of the load_image and
+    ImageSequence calls of `script`, `scene` being the top-level definition
+    they are in."""
+    with open(script) as f:
+        tree = ast.parse(f.read(), script)
+
+    def evaluate(node, namespace):
+        return eval(compile(ast.Expression(node), script, "eval"), {}, namespace)
+
+    # module-level constants such as image_resolution
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            try:
+                constants[node.targets[0].id] = evaluate(node.value, constants)
+            except Exception:
+                pass
+
+    calls = []
+    for definition in tree.body:
+        for node in ast.walk(definition):
+            if not (isinstance(node, ast.Call)
+                    and getattr(node.func, "id", None) in ("load_image", "ImageSequence")):
+                continue
+            if not (node.args and isinstance(node.args[0], ast.Constant)):
+                continue
+            kwargs = {"scale_to_resolution": QUALITIES[DEFAULT_QUALITY]["pixel_height"], "zoom": 1}
+            for keyword in node.keywords:
+                if keyword.arg in kwargs:
+                    kwargs[keyword.arg] = evaluate(keyword.value, constants)
+            calls.append((getattr(definition, "name", None), node.func.id,
+                node.args[0].value, kwargs))
+    return calls
+
+
+def image_loads(script):
+    """(filename, scale_to_resolution, zoom) of every load_image call in `script`."""
+    return [(filename, kwargs["scale_to_resolution"], kwargs["zoom"])
+        for _, call, filename, kwargs in asset_calls(script) if call == "load_image"]
+
+
+def prepare_images(script="presentation.py"):
+    """Writes the downscaled copies `script` needs at every quality preset."""
+    for filename, scale_to_resolution, zoom in image_loads(script):
+        try:
+            path = str(get_full_raster_image_path(filename))
+        except OSError:
+            logger.warning("missing image: %s", filename)
+            continue
+        content_hash, (_, source_height) = asset_cache.source_info(path)
+        for quality in QUALITIES.values():
+            height = screen_height(source_height, scale_to_resolution,
+                quality["pixel_height"], zoom)
+            if height < source_height:
+                resized_image(path, content_hash, height)
+
+
+def create_once(tmp_path, path):
+    """Moves `tmp_path` to `path` unless another process created `path` first,
+    whose file is then kept as it is being filled."""
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    os.remove(tmp_path)
+
+
+class FrameStack:
+    """The frames of a directory, decoded on first use into a cached .npy stack.
+
+    Use frame_stack(directory), which shares one stack per directory between
+    the mobjects and the prefetcher.
+    """
+
+    def __init__(self, directory):
+        self.paths = list_frames(directory)
+        stem = os.path.join(cache_dir, "frames-{}".format(file_signature(self.paths)))
+        self.stack_path = stem + ".npy"
+        self.decoded_path = stem + "-decoded.npy"
+        if not os.path.exists(self.stack_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            width, height = Image.open(self.paths[0]).size
+            tmp_path = "{}.{}.tmp.npy".format(self.stack_path, os.getpid())
+            np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8,
+                shape=(len(self.paths), height, width, 3)).flush()
+            create_once(tmp_path, self.stack_path)
+        if not os.path.exists(self.decoded_path):
+            tmp_path = "{}.{}.tmp.npy".format(self.decoded_path, os.getpid())
+            np.save(tmp_path, np.zeros(len(self.paths), dtype=bool))
+            create_once(tmp_path, self.decoded_path)
+        self.frames = np.load(self.stack_path, mmap_mode="r+")
+        self.decoded = np.load(self.decoded_path)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        if not self.decoded[index]:
+            with self.lock, profiler.timed("images"):
+                if not self.decoded[index]:
+                    self.frames[index] = Image.open(self.paths[index]).convert("RGB")
+                    self.frames.flush()
+                    self.decoded[index] = True
+                    tmp_path = "{}.{}.tmp.npy".format(self.decoded_path, os.getpid())
+                    np.save(tmp_path, self.decoded)
+                    os.replace(tmp_path, self.decoded_path)
+        return self.frames[index]
+
+    def decode_all(self):
+        for index in range(len(self)):
+            self[index]
+
+
+frame_stacks = {}
+frame_stacks_lock = threading.Lock()
+
+
+def frame_stack(directory):
+    with frame_stacks_lock:
+        if directory not in frame_stacks:
+            frame_stacks[directory] = FrameStack(directory)
+        return frame_stacks[directory]
+
+
+class ImageSequence(ImageMobject):
+    """An ImageMobject that swaps between the frames of a directory in place."""
+
+    def __init__(self, directory, **kwargs):
+        self.frames = frame_stack(directory)
+        super().__init__(self.frames[0], **kwargs)
+        self.frame_index = 0
+        self.shown_array = self.pixel_array
+        # counts the writes to shown_array, see pixels_state
+        self.pixels_version = 0
+
+    @property
+    def num_frames(self):
+        return len(self.frames)
+
+    def set_frame(self, index):
+        index = index % len(self.frames)
+        # animations may have swapped pixel_array for a fresh array
+        if index != self.frame_index or self.pixel_array is not self.shown_array:
+            # keep the current alpha so fades still apply to the sequence
+            self.pixel_array[:, :, :3] = self.frames[index]
+            self.frame_index = index
+            self.shown_array = self.pixel_array
+            self.pixels_version += 1
+        return self
+
+    def set_color(self, color, alpha=None, family=True):
+        self.pixels_version += 1
+        return super().set_color(color, alpha, family)
+
+    def set_opacity(self, alpha):
+        self.pixels_version += 1
+        return super().set_opacity(alpha)
+
+    def pixels_state(self):
+        """Tells DeckRenderer whether the pixels changed since it last drew
+        them, None once an animation has swapped in an array of its own."""
+        if self.pixel_array is not self.shown_array:
+            return None
+        return (id(self.shown_array), self.pixels_version)
+
+    def set_progress(self, alpha):
+        # maps [0, 1] onto the whole sequence, independently of the frame rate
+        alpha = min(max(alpha, 0), 1)
+        return self.set_frame(int(round(alpha * (self.num_frames - 1))))
+
+    def __deepcopy__(self, clone_from_id):
+        # copies share the frame stack
+        clone_from_id[id(self.frames)] = self.frames
+        return super().__deepcopy__(clone_from_id)
+
+
+class Prefetcher:
+    """Decodes the images and frame sequences of upcoming scenes on a thread
+    pool, so that the render thread finds them in the caches.
+
+    Which scene loads what comes from the load_image and ImageSequence calls of
+    the script. Failures are logged; the scene itself raises them when it loads
+    the file.
+    """
+
+    def __init__(self, script="presentation.py", workers=prefetch_workers):
+        self.calls = collections.defaultdict(list)
+        for scene, call, argument, kwargs in asset_calls(script):
+            self.calls[scene].append((call, argument, kwargs))
+        self.pool = concurrent.futures.ThreadPoolExecutor(workers,
+            thread_name_prefix="prefetch")
+        self.prefetched = set()
+
+    def prefetch(self, scene_name):
+        if scene_name in self.prefetched:
+            return
+        self.prefetched.add(scene_name)
+        for call, argument, kwargs in self.calls.get(scene_name, []):
+            if call == "ImageSequence":
+                future = self.pool.submit(lambda directory: frame_stack(directory).decode_all(),
+                    argument)
+            else:
+                future = self.pool.submit(cached_pixels, argument, kwargs["scale_to_resolution"],
+                    kwargs["zoom"])
+            future.add_done_callback(lambda future, argument=argument:
+                self.report(scene_name, argument, future))
+
+    def report(self, scene_name, argument, future):
+        if future.exception() is not None:
+            logger.warning("%s: could not prefetch %s: %s", scene_name, argument,
+                future.exception())
+
+
+if __name__ == "__main__":
+    prepare_images(*sys.argv[1:])
@@ -0,0 +1,165 @@
+"""Render benchmark of the deck's scenes.
+
+    python benchmark.py -q l -q m
+    python benchmark.py --save-baseline
+
+renders every scene of `presentation.slides` and SuperResolution at each
+quality, each in a fresh process: first with cold caches (empty tex directory,
+no downscaled images or frame stacks), then again with the caches it just
+filled. Manim's own partial movie cache is disabled in both runs, so every
+frame is rendered and encoded. Frames per second, wall time and peak memory of
+every run are written to benchmarks/latest.json and compared with
+benchmarks/baseline.json; runs slower than the baseline by more than the
+threshold are flagged and make the benchmark exit with status 1.
+"""
+from manim import *
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import presentation
+from profiling import peak_rss
+
+benchmark_dir = "benchmarks"
+baseline_path = os.path.join(benchmark_dir, "baseline.json")
+latest_path = os.path.join(benchmark_dir, "latest.json")
+default_qualities = ["low_quality", "medium_quality"]
+
+
+def run_scene(scene_name, quality, media_dir, asset_dir):
+    """Renders `scene_name` once in this process, returns its measurements."""
+    import assets
+    assets.cache_dir = asset_dir
+    config.input_file = "presentation.py"
+    config.quality = quality
+    config.media_dir = media_dir
+    config.disable_caching = True
+
+    start = time.perf_counter()
+    scene = getattr(presentation, scene_name)()
+    # Scene.render, without the pptx
+    Scene.render(scene)
+    wall = time.perf_counter() - start
+    frames = int(round(scene.renderer.time * config.frame_rate))
+    return {
+        "wall": wall,
+        "frames": frames,
+        "fps": frames / wall,
+        "peak_rss_mb": peak_rss(),
+    }
+
+
+def measure(scene_name, quality, media_dir, asset_dir):
+    # a fresh process per run, for a clean start and an honest peak memory
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "result.json")
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run",
+            scene_name, quality, media_dir, asset_dir, output],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if not os.path.exists(output):
+            return {"error": process.stderr.strip().splitlines()[-1:] or ["no result"]}
+        with open(output) as f:
+            return json.load(f)
+
+
+def machine():
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "manim": importlib.metadata.version("manim"),
+        "manim_pptx": importlib.metadata.version("manim_pptx"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Keys of the runs slower than their baseline by more than `threshold`."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base and "wall" in base and "wall" in result \
+                and result["wall"] > base["wall"] * (1 + threshold):
+            regressions.append(key)
+    return regressions
+
+
+def report(results, baseline, regressions):
+    rows = [("run", "frames", "time", "fps", "rss MB", "baseline", "change")]
+    for key, result in results.items():
+        if "error" in result:
+            rows.append((key, "error: " + " ".join(result["error"]), "", "", "", "", ""))
+            continue
+        base = baseline.get(key, {}).get("wall")
+        change = "" if not base else "{:+.0%}".format(result["wall"] / base - 1)
+        if key in regressions:
+            change += " !"
+        rows.append((key, result["frames"], "{:.2f}".format(result["wall"]),
+            "{:.1f}".format(result["fps"]), "{:.0f}".format(result["peak_rss_mb"]),
+            "" if not base else "{:.2f}".format(base), change))
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(str(v).ljust(w) for v, w in zip(row, widths)) for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rendering of the deck.")
+    parser.add_argument("scenes", nargs="*",
+        default=[s.__name__ for s in presentation.slides] + ["SuperResolution"])
+    parser.add_argument("-q", "--quality", action="append",
+        choices=[q["flag"] for q in QUALITIES.values() if q["flag"]])
+    parser.add_argument("--threshold", type=float, default=0.1,
+        help="slowdown over the baseline that counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true",
+        help="use this run as the baseline of the next ones")
+    args = parser.parse_args()
+
+    qualities = default_qualities if not args.quality else \
+        [k for k, q in QUALITIES.items() if q["flag"] in args.quality]
+    results = {}
+    for quality in qualities:
+        for scene_name in args.scenes:
+            cache = tempfile.mkdtemp(prefix="deck-benchmark-")
+            media_dir = os.path.join(cache, "media")
+            asset_dir = os.path.join(cache, "cache")
+            try:
+                for run in ("cold", "warm"):
+                    key = "{}/{}/{}".format(scene_name, quality, run)
+                    results[key] = measure(scene_name, quality, media_dir, asset_dir)
+                    print(key, results[key])
+            finally:
+                shutil.rmtree(cache, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    print(report(results, baseline, regressions))
+
+    os.makedirs(benchmark_dir, exist_ok=True)
+    paths = [latest_path] + ([baseline_path] if args.save_baseline else [])
+    for path in paths:
+        with open(path, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=4)
+    if regressions and not args.save_baseline:
+        print("{} regression(s) over {:.0%}: {}".format(
+            len(regressions), args.threshold, ", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        scene_name, quality, media_dir, asset_dir, output = sys.argv[2:]
+        result = run_scene(scene_name, quality, media_dir, asset_dir)
+        with open(output, "w") as f:
+            json.dump(result, f)
+    else:
+        main()
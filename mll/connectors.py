@@ -0,0 +1,54 @@
+"""Lines and arrows whose ends stay attached to other mobjects.
+
+`line.add_updater(lambda z: z.become(Line(a, b)))` builds a whole new Line on
+every frame. A connector keeps its own points instead and moves them in place,
+and only when one of its anchors actually moved.
+"""
+from manim import *
+
+import numpy as np
+
+
+class Connector:
+    """Mixin for Line and Arrow. Each end is anchored either to a mobject, and
+    lies on its bounding box the way Line places it, or to a callable returning
+    a point, such as `dot.get_center`.
+    """
+
+    def __init__(self, start, end, **kwargs):
+        self.start_anchor = start
+        self.end_anchor = end
+        self.anchor_state = None
+        super().__init__(self.anchor_point(start), self.anchor_point(end), **kwargs)
+        self.follow_anchors()
+        self.add_updater(lambda z: z.follow_anchors())
+
+    def anchor_point(self, anchor, direction=None):
+        if callable(anchor) and not isinstance(anchor, Mobject):
+            return np.asarray(anchor(), dtype=float)
+        return self._pointify(anchor, direction)
+
+    def follow_anchors(self):
+        rough_start = self.anchor_point(self.start_anchor)
+        rough_end = self.anchor_point(self.end_anchor)
+        if self.anchor_state is not None and np.array_equal(self.anchor_state[0], rough_start) \
+                and np.array_equal(self.anchor_state[1], rough_end):
+            return self
+        self.anchor_state = (rough_start, rough_end)
+
+        vect = normalize(rough_end - rough_start)
+        start = self.anchor_point(self.start_anchor, vect) + self.buff * vect
+        end = self.anchor_point(self.end_anchor, -vect) - self.buff * vect
+        if np.allclose(start, end) or np.dot(end - start, vect) <= 0:
+            # anchors overlap, keep the last position
+            return self
+        self.put_start_and_end_on(start, end)
+        return self
+
+
+class TrackedLine(Connector, Line):
+    pass
+
+
+class TrackedArrow(Connector, Arrow):
+    pass
@@ -0,0 +1,550 @@
+"""Renders the whole deck, one scene per process.
+
+    python deck.py -q l -j 8
+
+renders every scene of `presentation.slides` in its own worker process, then
+stitches their partial movies and endSlide markers into the same Slides.mp4
+and pptx/Slides.pptx that `manim -ql presentation.py Slides` produces.
+
+With --incremental, every endSlide section is fingerprinted (the construct
+source up to it, the module-level constants and helpers it uses and the files
+it opens) and sections that did not change since the last build reuse their
+partial movies instead of being rendered again. Every section a worker
+renders is checkpointed under cache/checkpoints as soon as its endSlide runs,
+so after a failed build --incremental picks up where it stopped. A scene
+cannot be restored half way through its construct: the worker replays the
+sections before it without rendering them and checks that it reached the
+state they were rendered in.
+
+With --split, the sections left to render of every scene are cut into runs
+of about equal length, from the play numbers and run times of a dry run (see
+dry_run.py), and the runs render in parallel.
+
+With --resolution 854x480 --resolution 3840x2160, every scene is evaluated
+once and written at those sizes as well (see rendering.py), and a Slides.mp4
+is stitched for each of them.
+
+With --memory-budget 1500, every worker releases each scene it rendered and
+keeps its resident memory under 1500 MB, see memory.py.
+
+With --package, the media of pptx/Slides.pptx are packed for presenting, see
+pptx_media.py.
+
+With --profile report.json, every slide of the rendered scenes is timed (see
+profiling.py) and the report of all workers is written to report.json.
+"""
+from manim import *
+from manim_pptx import *
+from manim.utils.exceptions import EndSceneEarlyException
+
+import argparse
+import ast
+import collections
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import textwrap
+
+import presentation
+import rendering
+from assets import Prefetcher, cache_dir, content_hash
+from profiling import profiler
+from dry_run import dry_run
+from memory import BudgetedScene, memory_budget
+from pptx_media import package, parse_bitrate
+from rendering import DeckFileWriter, resolution, state_digest
+from tex import prepare_tex
+
+
+# created by the workers that render a scene, see render_scene
+prefetcher = None
+
+
+def apply_config(options):
+    config.input_file = "presentation.py"
+    for key, value in options.items():
+        setattr(config, key, value)
+    if rendering.stream_slides or rendering.extra_resolutions:
+        # a streamed segment cannot skip plays that manim finds in its
+        # cache, nor can the outputs of the other sizes
+        config.disable_caching = True
+
+
+def size_name(size):
+    return "{}x{}".format(*size)
+
+
+def slide_plays(slide):
+    # streamed slides keep their play numbers apart from their movies
+    return slide.get("animations", [slide["start"], slide["end"]])
+
+
+def movie_files(file_writer):
+    # streamed slides point at segments, not at the movies of their plays
+    return file_writer.segments if file_writer.streaming else file_writer.partial_movie_files
+
+
+def output_movies(file_writer, start, end):
+    """{output: movies[start:end]} of the main and the extra resolutions."""
+    movies = {"main": movie_files(file_writer)[start:end]}
+    for mirror in file_writer.mirrors:
+        movies[size_name(mirror.resolution)] = movie_files(mirror)[start:end]
+    return movies
+
+
+class CheckpointScene:
+    """Mixin checkpointing every endSlide section of a deck scene.
+
+    A section that was rendered is appended to `checkpoint_path` as soon as
+    its endSlide runs, with its slide, movies and state_digest, so that the
+    next build can reuse it even if the scene fails further on. A section
+    that was replayed without rendering is checked against the state it had
+    when it was rendered. The scene ends at the endSlide of `last_section`,
+    if given.
+    """
+
+    fingerprints = []
+    checkpoint_path = None
+    # state_digest of the replayed sections, by section
+    expected_states = {}
+    last_section = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkpoints = []
+
+    def endSlide(self, *args, **kwargs):
+        super().endSlide(*args, **kwargs)
+        section = len(self.slides) - 1
+        slide = self.slides[-1]
+        file_writer = self.renderer.file_writer
+        plays = slide_plays(slide)
+        checkpoint = {
+            "section": section,
+            "fingerprint": self.fingerprints[section] if section < len(self.fingerprints) else None,
+            "slide": dict(slide, animations=plays),
+            "movies": output_movies(file_writer, slide["start"], slide["end"]),
+            "state": state_digest(self),
+        }
+        expected = self.expected_states.get(section)
+        if expected is not None and expected != checkpoint["state"]:
+            logger.warning("%s: slide %d replayed to another state than it was rendered in, "
+                "the slides after it may not match it", type(self).__name__, section + 1)
+        # replayed, not rendered: its plays have no movies, or its segment none
+        # (a streamed slide without plays has none either, and nothing to render)
+        if not (any(movie is None for movies in checkpoint["movies"].values() for movie in movies)
+                or file_writer.streaming and plays[1] > plays[0]
+                and file_writer.segments[slide["start"]] is None):
+            self.checkpoints.append(checkpoint)
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+            # one write per line, workers of the same scene append to the same file
+            with open(self.checkpoint_path, "a") as f:
+                f.write(json.dumps(checkpoint) + "\n")
+        if section == self.last_section:
+            # caught by Scene.render, which then finishes the movies as usual
+            raise EndSceneEarlyException()
+
+
+def render_scene(scene_name, options, checkpointing):
+    """Renders the plays of one scene of the deck that `options` asks for,
+    returns the checkpoints of its rendered sections, the movies after its
+    last endSlide if it rendered them and its profiled sections."""
+    apply_config(options)
+    # pool workers render several scenes in turn
+    profiler.reset()
+    global prefetcher
+    if prefetcher is None:
+        prefetcher = Prefetcher(presentation.__file__)
+    # decode the scene's images while its first slides render
+    prefetcher.prefetch(scene_name)
+    scene_class = getattr(presentation, scene_name)
+    scene = type(scene_name, (CheckpointScene, BudgetedScene, scene_class), checkpointing)()
+    if config.from_animation_number > 0 or config.upto_animation_number != float("inf") \
+            or scene.last_section is not None:
+        # other workers may render the rest of the scene at the same time
+        file_writer = scene.renderer.file_writer
+        for writer in [file_writer] + file_writer.mirrors:
+            writer.combine = False
+    # Scene.render, skipping the per-scene pptx that PPTXScene.render writes
+    super(PPTXScene, scene).render()
+    profiler.finish(scene_name)
+    tail = None
+    if config.upto_animation_number == float("inf") and scene.last_section is None:
+        end = scene.slides[-1]["end"] if scene.slides else 0
+        tail = output_movies(scene.renderer.file_writer, end, None)
+    # before the next scene the pool hands this worker
+    memory_budget.end_scene(scene, scene_name)
+    return scene.checkpoints, tail, profiler.sections
+
+
+def global_dependency(name, seen):
+    # what a module-level name of presentation.py contributes to a fingerprint
+    value = vars(presentation).get(name)
+    # helpers, and classes such as GeneratorDiagram along with what their methods use
+    if (inspect.isfunction(value) or inspect.isclass(value)) \
+            and value.__module__ == presentation.__name__:
+        if name in seen:
+            return ""
+        seen.add(name)
+        source = textwrap.dedent(inspect.getsource(value))
+        return source + "".join(dep for _, dep in source_dependencies(ast.parse(source), seen))
+    if isinstance(value, (bool, int, float, str)):
+        return "{}={!r}".format(name, value)
+    return ""
+
+
+def source_dependencies(tree, seen):
+    """(line, dependency) for the module-level names and files used in `tree`."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            yield node.lineno, global_dependency(node.id, seen)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) \
+                and os.path.exists(node.value):
+            yield node.lineno, "{}:{}".format(node.value, content_hash(node.value))
+
+
+def section_fingerprints(scene_class):
+    """One fingerprint per endSlide of `scene_class.construct`.
+
+    Each section's fingerprint covers every line before it, since a section
+    starts from the state the previous ones left behind, and the scene's other
+    methods, such as SuperResolution.__init__.
+    """
+    methods = ""
+    for attr, value in vars(scene_class).items():
+        if attr != "construct" and inspect.isfunction(value):
+            method = textwrap.dedent(inspect.getsource(value))
+            methods += method + "".join(dep for _, dep in
+                source_dependencies(ast.parse(method), set()))
+    source = textwrap.dedent(inspect.getsource(scene_class.construct))
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    dependencies = sorted(source_dependencies(tree, set()))
+    ends = sorted(node.lineno for node in ast.walk(tree) if isinstance(node, ast.Call)
+        and getattr(node.func, "attr", None) == "endSlide")
+
+    fingerprints = []
+    for end in ends:
+        fingerprint = hashlib.sha1((methods + "\n".join(lines[:end])).encode())
+        for line, dependency in dependencies:
+            if line <= end:
+                fingerprint.update(dependency.encode())
+        fingerprints.append(fingerprint.hexdigest())
+    return fingerprints
+
+
+def checkpoint_path(scene_name, options):
+    return os.path.join(cache_dir, "checkpoints", "{}-{}.jsonl".format(
+        scene_name, options["quality"]))
+
+
+def read_checkpoints(path):
+    """{section: checkpoint} of the checkpoints in `path`, the last of each section."""
+    checkpoints = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    checkpoint = json.loads(line)
+                except ValueError:
+                    # the line a crash cut short
+                    continue
+                checkpoints[checkpoint["section"]] = checkpoint
+    return checkpoints
+
+
+def movies_exist(movies):
+    outputs = ["main"] + [size_name(size) for size in rendering.extra_resolutions]
+    return all(output in movies and all(m is not None and os.path.exists(m)
+        for m in movies[output]) for output in outputs)
+
+
+def reusable_sections(cached, fingerprints):
+    """{section: checkpoint} of the cached sections whose movies can be reused."""
+    return {section: checkpoint for section, checkpoint in cached.items()
+        if section < len(fingerprints) and checkpoint["fingerprint"] == fingerprints[section]
+        and movies_exist(checkpoint["movies"])}
+
+
+def section_ranges(count, reused):
+    """(first, last) of the runs of sections left to render."""
+    ranges = []
+    for section in range(count):
+        if section in reused:
+            continue
+        if ranges and ranges[-1][1] == section - 1:
+            ranges[-1][1] = section
+        else:
+            ranges.append([section, section])
+    return [tuple(r) for r in ranges]
+
+
+def play_bounds(first, last, count, reused, plays):
+    """(from, upto) animation numbers that render sections first to last of
+    a scene with `count` sections.
+
+    The play numbers come from the reused sections around them, or else from
+    `plays`, the number of plays of every section in a dry run.
+    """
+    if first == 0:
+        start = 0
+    elif first - 1 in reused:
+        start = reused[first - 1]["slide"]["animations"][1]
+    else:
+        start = sum(plays[:first])
+    if last == count - 1:
+        # and the plays after the last endSlide
+        return start, -1
+    if last + 1 in reused:
+        end = reused[last + 1]["slide"]["animations"][0]
+    else:
+        end = sum(plays[:last + 1])
+    if end <= 1:
+        # upto_animation_number 0 would mean no limit; the worker stops at the
+        # endSlide of `last` instead, see CheckpointScene.last_section
+        return start, -1
+    return start, end - 1
+
+
+def manifest_path(options):
+    return os.path.join(cache_dir, "deck-{}.json".format(options["quality"]))
+
+
+class StitchedScene(Scene):
+    """Adopts already rendered slides instead of rendering anything itself."""
+
+    parts = []
+
+    def render(self, *args, **kwargs):
+        file_writer = self.renderer.file_writer
+        for slides, partial_movie_files in self.parts:
+            offset = len(file_writer.partial_movie_files)
+            for slide in slides:
+                self.slides.append(dict(slide,
+                    start=slide["start"] + offset,
+                    end=slide["end"] + offset,
+                    number=len(self.slides) + 1))
+            file_writer.partial_movie_files += partial_movie_files
+        file_writer.combine_to_movie()
+
+
+def stitch(scene_name, parts):
+    # PPTXScene.render calls StitchedScene.render, then writes the pptx for
+    # the stitched slides under `scene_name`
+    deck = type(scene_name, (PPTXScene, StitchedScene), {"parts": parts})()
+    deck.render()
+    return deck
+
+
+def stitch_resolution(scene_name, deck, movie_lists, size):
+    """Combines the partial movies of one of the extra resolutions."""
+    with resolution(*size):
+        file_writer = DeckFileWriter(deck.renderer, scene_name)
+    file_writer.partial_movie_files = [movie for movies in movie_lists for movie in movies]
+    file_writer.combine_to_movie()
+
+
+def split_range(first, last, durations, target):
+    """Cuts sections first to last into runs of about `target` seconds."""
+    runs = [[first, first]]
+    length = durations[first]
+    for section in range(first + 1, last + 1):
+        if length >= target:
+            runs.append([section, section])
+            length = 0
+        runs[-1][1] = section
+        length += durations[section]
+    return [tuple(run) for run in runs]
+
+
+def dry_run_plays(scene_names):
+    """{scene: [(plays, duration)] of every section}, from dry runs."""
+    sections = {}
+    with tempconfig({"dry_run": True, "disable_caching": True, "progress_bar": "none"}):
+        for name in scene_names:
+            scene, error = dry_run(getattr(presentation, name))
+            if error:
+                logger.warning("%s is not split, its dry run failed:\n%s", name, error)
+                continue
+            sections[name] = [(section["plays"], section["duration"])
+                for section in scene.dry_run_sections if section["slide"] is not None]
+    return sections
+
+
+def compact(sections, tail):
+    """Slides and {output: partial movies} of a scene from its checkpoints,
+    the slides pointing into the movies."""
+    outputs = ["main"] + [size_name(size) for size in rendering.extra_resolutions]
+    slides = []
+    movies = {output: [] for output in outputs}
+    for checkpoint in sections:
+        start = len(movies["main"])
+        slides.append(dict(checkpoint["slide"], start=start,
+            end=start + len(checkpoint["movies"]["main"])))
+        for output in outputs:
+            movies[output] += checkpoint["movies"][output]
+    for output in outputs:
+        movies[output] += (tail or {}).get(output, [])
+    return slides, movies
+
+
+def render_deck(scene_names, jobs, options, incremental=False, split=False):
+    manifest = {}
+    if incremental and os.path.exists(manifest_path(options)):
+        with open(manifest_path(options)) as f:
+            manifest = json.load(f)
+
+    fingerprints = {}
+    reused = {}
+    ranges = {}
+    for name in scene_names:
+        fingerprints[name] = section_fingerprints(getattr(presentation, name))
+        cached = {}
+        if incremental:
+            # sections of the last build, then those a failed build checkpointed
+            cached = {c["section"]: c for c in manifest.get(name, {}).get("sections", [])}
+            cached.update(read_checkpoints(checkpoint_path(name, options)))
+        reused[name] = reusable_sections(cached, fingerprints[name])
+        count = len(fingerprints[name])
+        if count == 0:
+            # no endSlide to resume from
+            ranges[name] = [(0, -1)]
+        else:
+            ranges[name] = section_ranges(count, reused[name])
+        tail = manifest.get(name, {}).get("tail")
+        if not ranges[name] and not (tail is not None and movies_exist(tail)):
+            # the movies after the last endSlide are only kept in the manifest
+            ranges[name] = [(count - 1, count - 1)]
+            del reused[name][count - 1]
+
+    plays = {}
+    if split:
+        long_scenes = [name for name in scene_names
+            if any(last > first for first, last in ranges[name])]
+        plays = dry_run_plays(long_scenes)
+        # about one run of sections per job
+        total = sum(plays[name][section][1] for name in plays
+            for first, last in ranges[name] for section in range(first, last + 1))
+        for name in plays:
+            durations = [duration for _, duration in plays[name]]
+            ranges[name] = [run for first, last in ranges[name]
+                for run in split_range(first, last, durations, total / jobs)]
+
+    tasks = []
+    for name in scene_names:
+        count = len(fingerprints[name])
+        section_plays = [p for p, _ in plays.get(name, [])]
+        for first, last in ranges[name]:
+            start, upto = play_bounds(first, last, count, reused[name], section_plays)
+            # replay the sections before it without rendering them
+            checkpointing = {
+                "fingerprints": fingerprints[name],
+                "checkpoint_path": checkpoint_path(name, options),
+                "expected_states": {first - 1: reused[name][first - 1]["state"]}
+                    if first - 1 in reused[name] else {},
+                "last_section": last if last < count - 1 else None,
+            }
+            tasks.append(((name, first, last), (name, dict(options,
+                from_animation_number=start, upto_animation_number=upto), checkpointing)))
+
+    results = []
+    if tasks:
+        # the workers find the svgs of every tex string in manim's cache
+        apply_config(options)
+        prepare_tex(presentation, jobs)
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(jobs) as pool:
+            results = pool.starmap(render_scene, [args for _, args in tasks])
+
+    rendered = collections.defaultdict(dict)
+    tails = {name: manifest.get(name, {}).get("tail") for name in scene_names}
+    profiled = []
+    for ((name, first, last), _), (checkpoints, tail, scene_sections) in zip(tasks, results):
+        profiled += scene_sections
+        for checkpoint in checkpoints:
+            if first <= checkpoint["section"] <= last:
+                rendered[name][checkpoint["section"]] = checkpoint
+        if last == len(fingerprints[name]) - 1:
+            tails[name] = tail
+
+    parts = []
+    extra_parts = collections.defaultdict(list)
+    for name in scene_names:
+        sections = [reused[name].get(section) or rendered[name].get(section)
+            for section in range(len(fingerprints[name]))]
+        if None in sections:
+            raise RuntimeError("{} did not render slide {}".format(name, sections.index(None) + 1))
+        manifest[name] = {"sections": sections, "tail": tails[name]}
+        slides, movies = compact(sections, tails[name])
+        parts.append((slides, movies["main"]))
+        for size in rendering.extra_resolutions:
+            extra_parts[size].append(movies[size_name(size)])
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(manifest_path(options), "w") as f:
+        json.dump(manifest, f, indent=4)
+    # the manifest has everything they had
+    for name in scene_names:
+        if os.path.exists(checkpoint_path(name, options)):
+            os.remove(checkpoint_path(name, options))
+    if profiler.enabled:
+        profiler.write(profiled)
+    apply_config(options)
+    deck = stitch("Slides", parts)
+    for size, movie_lists in extra_parts.items():
+        stitch_resolution("Slides", deck, movie_lists, size)
+    return deck
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the slides deck.")
+    parser.add_argument("scenes", nargs="*",
+        default=[s.__name__ for s in presentation.slides])
+    parser.add_argument("-q", "--quality", default="h",
+        choices=[q["flag"] for q in QUALITIES.values() if q["flag"]])
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("-i", "--incremental", action="store_true",
+        help="only render the slides that changed since the last build")
+    parser.add_argument("--split", action="store_true",
+        help="render the sections of long scenes in parallel, from a dry run's play numbers")
+    parser.add_argument("--stream", action="store_true",
+        help="encode one movie per slide instead of one per animation")
+    parser.add_argument("--resolution", action="append", default=[], metavar="WxH",
+        help="also write the deck at this size, from the same scene evaluation")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+        help="release every scene once rendered and spill the caches, or fail, when a "
+            "worker's resident memory goes over MB")
+    parser.add_argument("--package", action="store_true",
+        help="store repeated movies of the pptx once and shrink its holds, see pptx_media.py")
+    parser.add_argument("--bitrate", type=parse_bitrate,
+        help="with --package, encode the movies over this bitrate (4M, 800k) down to it")
+    parser.add_argument("--profile", metavar="JSON",
+        help="time every slide of the rendered scenes and write the report to JSON")
+    args = parser.parse_args()
+    if args.profile:
+        # read by the workers when they import profiling
+        os.environ["DECK_PROFILE"] = profiler.path = os.path.abspath(args.profile)
+    if args.memory_budget:
+        # read by the workers when they import memory
+        os.environ["DECK_MEMORY_BUDGET"] = str(args.memory_budget)
+    if args.stream:
+        # read by the workers when they import rendering
+        os.environ["DECK_STREAM"] = "1"
+
+    quality = [k for k, q in QUALITIES.items() if q["flag"] == args.quality][0]
+    main_size = (QUALITIES[quality]["pixel_width"], QUALITIES[quality]["pixel_height"])
+    rendering.extra_resolutions[:] = [size for size in
+        rendering.parse_resolutions(",".join(args.resolution)) if size != main_size]
+    if rendering.extra_resolutions:
+        # read by the workers when they import rendering
+        os.environ["DECK_RESOLUTIONS"] = ",".join(map(size_name, rendering.extra_resolutions))
+    options = {"quality": quality, "from_animation_number": 0, "upto_animation_number": -1}
+    deck = render_deck(args.scenes, args.jobs, options, args.incremental, args.split)
+    if args.package:
+        package(os.path.join(deck.output_folder, "Slides.pptx"), args.bitrate)
+
+
+if __name__ == "__main__":
+    main()
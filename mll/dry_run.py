@@ -0,0 +1,173 @@
+"""Checks that the deck builds, without rendering it.
+
+    python dry_run.py [scenes]
+
+runs the construct of every scene of presentation.py (or of the given ones)
+with a renderer that jumps each play and wait straight to its last frame,
+runs the updaters there once and never rasterizes, encodes or writes
+anything. It reports the time and mobject count of every endSlide section,
+the scenes that raised and the images referenced in presentation.py that do
+not exist, and exits with status 1 if there was any problem.
+"""
+from manim import *
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils.images import get_full_raster_image_path
+
+import argparse
+import ast
+import os
+import sys
+import time
+import traceback
+
+import presentation
+
+# calls whose first argument is a file or directory the scene loads
+asset_loaders = {"load_image": "image", "ImageMobject": "image", "ImageSequence": "directory"}
+
+
+class DryRunRenderer(CairoRenderer):
+    """Plays every animation straight to its end state, rasterizes nothing."""
+
+    def __init__(self, camera_class=None):
+        super().__init__(camera_class=camera_class, skip_animations=True)
+
+    def update_frame(self, *args, **kwargs):
+        pass
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        self.static_image = None
+
+    def render(self, *args, **kwargs):
+        pass
+
+    def freeze_current_frame(self, duration):
+        pass
+
+    def scene_finished(self, scene):
+        pass
+
+    def keyframe(self, scene):
+        """Rasterizes the current state of `scene` once, as a PIL image."""
+        self.static_image = None
+        CairoRenderer.update_frame(self, scene)
+        return self.camera.get_image()
+
+
+class DryRunScene:
+    """Mixin recording the sections of a dry run."""
+
+    renderer_class = DryRunRenderer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # same camera as the scene would use, zoomed scenes need theirs
+        self.renderer = self.renderer_class(camera_class=type(self.renderer.camera))
+        self.renderer.init_scene(self)
+        self.dry_run_sections = []
+        self.section_start = time.perf_counter()
+        self.section_plays = 0
+        self.section_start_time = 0
+
+    def play(self, *args, **kwargs):
+        super().play(*args, **kwargs)
+        self.section_plays += 1
+
+    def endSlide(self, *args, **kwargs):
+        if hasattr(super(), "endSlide"):
+            super().endSlide(*args, **kwargs)
+        self.end_section(len(self.dry_run_sections) + 1)
+
+    def end_section(self, slide):
+        self.dry_run_sections.append({
+            "slide": slide,
+            "time": time.perf_counter() - self.section_start,
+            "plays": self.section_plays,
+            # of the movie, the renderer adds up the run times it skips
+            "duration": self.renderer.time - self.section_start_time,
+            "mobjects": len(self.get_mobject_family_members()),
+        })
+        self.section_start = time.perf_counter()
+        self.section_plays = 0
+        self.section_start_time = self.renderer.time
+
+
+def dry_run(scene_class, mixin=DryRunScene):
+    """(scene, error) of a dry run of `scene_class`."""
+    scene = type(scene_class.__name__, (mixin, scene_class), {})()
+    error = None
+    try:
+        # Scene.render, without PPTXScene's pptx
+        Scene.render(scene)
+    except Exception:
+        error = traceback.format_exc(limit=-3)
+    if scene.section_plays:
+        scene.end_section(None)
+    return scene, error
+
+
+def missing_assets(script):
+    """(scene, line, path) of the files `script` loads that do not exist."""
+    with open(script) as f:
+        tree = ast.parse(f.read(), script)
+    missing = []
+    for definition in tree.body:
+        for node in ast.walk(definition):
+            if not (isinstance(node, ast.Call) and getattr(node.func, "id", None) in asset_loaders):
+                continue
+            if not (node.args and isinstance(node.args[0], ast.Constant)):
+                continue
+            path = node.args[0].value
+            if asset_loaders[node.func.id] == "directory":
+                exists = os.path.isdir(path)
+            else:
+                try:
+                    get_full_raster_image_path(path)
+                    exists = True
+                except OSError:
+                    exists = False
+            if not exists:
+                missing.append((getattr(definition, "name", "<module>"), node.lineno, path))
+    return missing
+
+
+def main():
+    scene_classes = [value for value in vars(presentation).values()
+        if isinstance(value, type) and issubclass(value, Scene)
+        and value.__module__ == presentation.__name__ and value is not presentation.Slides]
+    parser = argparse.ArgumentParser(description="Build the deck without rendering it.")
+    parser.add_argument("scenes", nargs="*", default=[s.__name__ for s in scene_classes])
+    args = parser.parse_args()
+
+    config.input_file = "presentation.py"
+    config.dry_run = True
+    config.disable_caching = True
+    config.progress_bar = "none"
+
+    problems = 0
+    start = time.perf_counter()
+    rows = [("scene", "slide", "time", "plays", "mobjects")]
+    for name in args.scenes:
+        scene, error = dry_run(getattr(presentation, name))
+        for section in scene.dry_run_sections:
+            rows.append((name, "-" if section["slide"] is None else section["slide"],
+                "{:.2f}".format(section["time"]), section["plays"], section["mobjects"]))
+        if error:
+            problems += 1
+            rows.append((name, "error", "", "", ""))
+            print("{} failed:\n{}".format(name, error), file=sys.stderr)
+
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+    for scene, line, path in missing_assets("presentation.py"):
+        problems += 1
+        print("missing asset: {} (presentation.py:{}, {})".format(path, line, scene))
+    print("dry run of {} scene(s) in {:.1f}s, {} problem(s)".format(
+        len(args.scenes), time.perf_counter() - start, problems))
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Interpolates the transforms of a play call together.
+
+Manim interpolates every animation of a play call on its own, mobject by
+mobject, with a handful of small numpy operations for each. The transforms of
+a play call that share their timing (FadeIn, FadeOut, Transform, .animate and
+the like, along straight paths and without lag) are interpolated here as one:
+the start and end values of every point, color and width of their mobjects
+are stacked once when the play begins, and each frame takes a single numpy
+operation over the stack, handing every mobject views of the result.
+"""
+from manim import Animation, Mobject, Transform, VMobject
+from manim.utils.bezier import interpolate
+
+import collections
+
+import numpy as np
+
+# what VMobject.interpolate_color and Mobject.interpolate set
+interpolated_attrs = ("points", "fill_rgbas", "stroke_rgbas", "background_stroke_rgbas",
+    "stroke_width", "background_stroke_width", "sheen_direction", "sheen_factor")
+
+
+def batchable(animation):
+    """Whether `animation` interpolates its mobjects the way Transform does."""
+    cls = type(animation)
+    return (isinstance(animation, Transform)
+        and cls.interpolate is Animation.interpolate
+        and cls.interpolate_mobject is Animation.interpolate_mobject
+        and cls.interpolate_submobject is Transform.interpolate_submobject
+        and animation.path_func is interpolate
+        and animation.lag_ratio == 0
+        # updaters could change the family, or the start and end, while it plays
+        and not any(mob.get_family_updaters() for mob in animation.get_all_mobjects()))
+
+
+def interpolated_values(animation):
+    """(mobject, attr, start, end) of everything `animation` interpolates,
+    None when some of it cannot be stacked."""
+    values = []
+    for mob, start, end in animation.get_all_families_zipped():
+        if not isinstance(mob, VMobject) or type(mob).interpolate is not Mobject.interpolate \
+                or type(mob).interpolate_color is not VMobject.interpolate_color:
+            return None
+        for attr in interpolated_attrs:
+            start_value = np.asarray(getattr(start, attr), dtype=float)
+            end_value = np.asarray(getattr(end, attr), dtype=float)
+            if start_value.shape != end_value.shape:
+                return None
+            values.append((mob, attr, start_value, end_value))
+    return values
+
+
+class AnimationBatch:
+    """Transforms with the same timing, interpolated as one array."""
+
+    def __init__(self, rate_func, run_time, reverse_rate_function):
+        self.rate_func = rate_func
+        self.run_time = run_time
+        self.reverse_rate_function = reverse_rate_function
+        self.values = []
+
+    def pack(self):
+        # (mobject, attr, start, stop, shape) of every value in the stack
+        self.targets = []
+        offset = 0
+        for mob, attr, start, _ in self.values:
+            self.targets.append((mob, attr, offset, offset + start.size, start.shape))
+            offset += start.size
+        self.start = np.concatenate([start.ravel() for _, _, start, _ in self.values])
+        end = np.concatenate([end.ravel() for _, _, _, end in self.values])
+        self.delta = end - self.start
+        self.values = None
+
+    def interpolate(self, t):
+        # Animation.get_sub_alpha, without lag
+        alpha = t / self.run_time
+        alpha = self.rate_func(1 - alpha if self.reverse_rate_function else alpha)
+        # a new stack every frame, so that values kept from the previous one stay as they were
+        stack = self.start + alpha * self.delta
+        for mob, attr, start, stop, shape in self.targets:
+            setattr(mob, attr, stack[start:stop].reshape(shape) if shape else stack[start])
+
+
+def batch_animations(animations):
+    """Splits `animations` into AnimationBatches and the animations left to
+    interpolate on their own."""
+    batches = collections.OrderedDict()
+    rest = []
+    for animation in animations:
+        values = interpolated_values(animation) if batchable(animation) else None
+        if not values:
+            rest.append(animation)
+            continue
+        key = (animation.rate_func, animation.run_time, animation.reverse_rate_function)
+        if key not in batches:
+            batches[key] = AnimationBatch(*key)
+        batches[key].values += values
+    for batch in batches.values():
+        batch.pack()
+    return list(batches.values()), rest
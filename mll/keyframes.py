@@ -0,0 +1,73 @@
+"""Exports the last frame of every slide as a still.
+
+    python keyframes.py -q h --pdf
+
+plays the Slides deck (or the given scene) the way dry_run.py does, straight
+to the end of each animation without rasterizing, and rasterizes once at each
+endSlide. The stills are written as keyframes/<Scene>-<slide>.png, and with
+--pdf as one keyframes/<Scene>.pdf handout as well.
+"""
+from manim import *
+
+import argparse
+import os
+import sys
+
+import presentation
+from dry_run import DryRunScene, dry_run
+
+
+class KeyframeScene(DryRunScene):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keyframes = []
+
+    def end_section(self, slide):
+        super().end_section(slide)
+        if slide is not None:
+            self.keyframes.append(self.renderer.keyframe(self))
+
+
+def export_keyframes(scene_name, output_dir, pdf=False):
+    """Writes the stills of `scene_name`, returns (paths, error)."""
+    scene, error = dry_run(getattr(presentation, scene_name), KeyframeScene)
+    keyframes = scene.keyframes
+    if error:
+        print("{} failed after {} slide(s):\n{}".format(scene_name, len(keyframes), error),
+            file=sys.stderr)
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for number, image in enumerate(keyframes, 1):
+        paths.append(os.path.join(output_dir, "{}-{:03d}.png".format(scene_name, number)))
+        image.save(paths[-1])
+    if pdf and keyframes:
+        pages = [image.convert("RGB") for image in keyframes]
+        paths.append(os.path.join(output_dir, "{}.pdf".format(scene_name)))
+        pages[0].save(paths[-1], save_all=True, append_images=pages[1:])
+    return paths, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export one still per slide.")
+    parser.add_argument("scene", nargs="?", default="Slides")
+    parser.add_argument("-q", "--quality", default="h",
+        choices=[q["flag"] for q in QUALITIES.values() if q["flag"]])
+    parser.add_argument("-o", "--output", default="keyframes")
+    parser.add_argument("--pdf", action="store_true", help="also write a pdf handout")
+    args = parser.parse_args()
+
+    config.input_file = "presentation.py"
+    config.quality = [k for k, q in QUALITIES.items() if q["flag"] == args.quality][0]
+    config.dry_run = True
+    config.disable_caching = True
+    config.progress_bar = "none"
+
+    paths, error = export_keyframes(args.scene, args.output, args.pdf)
+    print("wrote {} file(s) to {}".format(len(paths), args.output))
+    sys.exit(1 if error else 0)
+
+
+if __name__ == "__main__":
+    main()
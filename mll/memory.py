@@ -0,0 +1,122 @@
+"""Opt-in memory budget for the deck's renders.
+
+    DECK_MEMORY_BUDGET=1500 manim -ql presentation.py Slides
+
+releases what a scene leaves behind once its construct is done: its
+mobjects, the animations and updaters that hold on to them, the frames the
+renderer kept and the cycles they form. The peak and retained resident memory
+of every scene is logged. Whenever the resident memory is over the budget, in
+MB, at a scene boundary, the decoded images are spilled to the cache
+directory and mapped back, the frame stacks and parsed tex mobjects are
+dropped, and if that is still not enough the render fails with MemoryError.
+Within a scene, its images still hold the pixels the cache would spill, so an
+endSlide over the budget is only logged.
+
+The budget needs the current resident memory from /proc, so it only applies
+on Linux. Elsewhere the scenes are still released, and the peaks logged are
+those of the whole process so far rather than per scene.
+"""
+from manim import logger
+
+import gc
+import os
+
+import assets
+from assets import asset_cache
+from profiling import peak_rss, profiler
+from tex import tex_cache
+
+
+def proc_status(field):
+    # in MB, None where there is no /proc
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    return None
+
+
+def current_rss():
+    # None where it cannot be read: the peak never goes down, so it cannot stand in
+    return proc_status("VmRSS")
+
+
+def scene_peak_rss():
+    peak = proc_status("VmHWM")
+    return peak_rss() if peak is None else peak
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def spill_caches():
+    """Drops or spills to disk the caches shared by every scene."""
+    asset_cache.spill()
+    with assets.frame_stacks_lock:
+        assets.frame_stacks.clear()
+    tex_cache.clear()
+    gc.collect()
+
+
+class MemoryBudget:
+
+    def __init__(self, budget=None):
+        self.budget = budget
+
+    @property
+    def enabled(self):
+        return self.budget is not None
+
+    def check(self, where):
+        rss = current_rss()
+        if not self.enabled or rss is None or rss <= self.budget:
+            return
+        spill_caches()
+        logger.info("%s: %.0f MB resident, over the budget of %.0f MB, spilled the caches "
+            "down to %.0f MB", where, rss, self.budget, current_rss())
+        if current_rss() > self.budget:
+            raise MemoryError("{}: {:.0f} MB resident after spilling the caches, over the "
+                "budget of {:.0f} MB".format(where, current_rss(), self.budget))
+
+    def end_scene(self, scene, scene_name):
+        """Releases what `scene_name` left in `scene` and reports its memory."""
+        if not self.enabled:
+            return
+        peak = scene_peak_rss()
+        scene.release()
+        # the updaters it profiled, and the closures they hold
+        profiler.updater_wrappers.clear()
+        gc.collect()
+        retained = current_rss()
+        if retained is None:
+            logger.info("%s: peak %.0f MB", scene_name, peak)
+        else:
+            logger.info("%s: peak %.0f MB, %.0f MB retained", scene_name, peak, retained)
+        self.check(scene_name)
+        reset_peak_rss()
+
+
+class BudgetedScene:
+    """Mixin logging the endSlides over the memory budget."""
+
+    def endSlide(self, *args, **kwargs):
+        super().endSlide(*args, **kwargs)
+        rss = current_rss()
+        if memory_budget.enabled and rss is not None and rss > memory_budget.budget:
+            logger.warning("%s slide %d: %.0f MB resident, over the budget of %.0f MB",
+                self.constructing_scene(), self.currentSlide - 1, rss, memory_budget.budget)
+
+
+budget = os.environ.get("DECK_MEMORY_BUDGET")
+memory_budget = MemoryBudget(float(budget) if budget else None)
+if memory_budget.enabled and current_rss() is None:
+    logger.warning("DECK_MEMORY_BUDGET: the resident memory cannot be read here, "
+        "the budget is not enforced")
@@ -0,0 +1,147 @@
+"""Packs the pptx of the deck for presenting from a laptop.
+
+    python pptx_media.py pptx/Slides.pptx --bitrate 4M
+
+rewrites the media that PPTXScene embedded in a pptx, in place:
+
+- movies that show the same frames for the same time, and identical posters,
+  are stored once and shared by every slide that uses them,
+- movies that hold a single frame, the long holds of the deck, are encoded
+  again as that frame: one keyframe followed by frames that only repeat it,
+- movies over the bitrate, if one is given, are encoded again down to it,
+- every movie has its index moved to the front and is stored uncompressed in
+  the pptx, so that it starts and seeks without reading the whole file.
+
+Movies keep their durations, so the timing of the slides still holds. A
+still stays a movie: manim_pptx's timeline plays every movie of a slide as
+media, one after the other.
+"""
+from manim import config, logger
+
+import argparse
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import zipfile
+
+movie_extensions = (".mp4", ".mov")
+
+
+def parse_bitrate(value):
+    """Bits per second of "4M", "800k" or "4000000"."""
+    units = {"k": 10 ** 3, "M": 10 ** 6}
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def frame_hashes(path):
+    """(pts, duration, md5) of every decoded frame of `path`."""
+    output = subprocess.run([config.ffmpeg_executable, "-v", "error", "-i", path,
+        "-map", "0:v:0", "-f", "framemd5", "-"], check=True, capture_output=True, text=True).stdout
+    frames = []
+    for line in output.splitlines():
+        if line and not line.startswith("#"):
+            _, _, pts, duration, _, md5 = (field.strip() for field in line.split(","))
+            frames.append((pts, duration, md5))
+    return frames
+
+
+def bitrate(path):
+    output = subprocess.run(["ffprobe", "-v", "quiet", "-show_entries", "format=bit_rate",
+        "-of", "csv=p=0", path], check=True, capture_output=True, text=True).stdout.strip()
+    return int(output) if output.isdigit() else 0
+
+
+def encode(path, packed_path, args):
+    subprocess.run([config.ffmpeg_executable, "-v", "error", "-y", "-i", path, "-map", "0"]
+        + args + ["-movflags", "+faststart", packed_path], check=True)
+
+
+def pack_movie(path, frames, target_bitrate=None):
+    """Bytes of `path` packed as the module docstring says."""
+    packed_path = path + ".packed" + os.path.splitext(path)[1]
+    if len(frames) > 1 and len({md5 for _, _, md5 in frames}) == 1:
+        # a hold: the repeated frames cost a few bytes each
+        encode(path, packed_path, ["-c:v", "libx264", "-tune", "stillimage", "-crf", "12",
+            "-g", str(len(frames)), "-pix_fmt", "yuv420p", "-c:a", "copy"])
+    elif target_bitrate and bitrate(path) > target_bitrate:
+        encode(path, packed_path, ["-c:v", "libx264", "-b:v", str(target_bitrate),
+            "-maxrate", str(target_bitrate), "-bufsize", str(2 * target_bitrate),
+            "-pix_fmt", "yuv420p", "-c:a", "copy"])
+    else:
+        encode(path, packed_path, ["-c", "copy"])
+    with open(packed_path, "rb") as f:
+        return f.read()
+
+
+def package(pptx_path, target_bitrate=None):
+    """Packs the media of `pptx_path` in place."""
+    with zipfile.ZipFile(pptx_path) as source, tempfile.TemporaryDirectory() as tmp:
+        media = [name for name in source.namelist() if name.startswith("ppt/media/")]
+        # media part -> the part stored in its place, and the packed bytes of those
+        kept = {}
+        packed = {}
+        by_content = {}
+        for name in media:
+            data = source.read(name)
+            if name.endswith(movie_extensions):
+                path = os.path.join(tmp, os.path.basename(name))
+                with open(path, "wb") as f:
+                    f.write(data)
+                frames = frame_hashes(path)
+                content = hashlib.sha1(repr(frames).encode()).hexdigest()
+            else:
+                frames = None
+                content = hashlib.sha1(data).hexdigest()
+            if content in by_content:
+                kept[name] = by_content[content]
+                continue
+            kept[name] = by_content[content] = name
+            packed[name] = data if frames is None else pack_movie(path, frames, target_bitrate)
+
+        dropped = {os.path.basename(name): os.path.basename(kept[name])
+            for name in media if kept[name] != name}
+        packed_pptx = pptx_path + ".packing"
+        with zipfile.ZipFile(packed_pptx, "w", zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                if item.filename in packed:
+                    # stored, so that a movie is read straight from the file
+                    target.writestr(item.filename, packed[item.filename], zipfile.ZIP_STORED)
+                elif item.filename in kept:
+                    continue
+                elif item.filename.endswith(".rels") or item.filename == "[Content_Types].xml":
+                    target.writestr(item, point_at_kept(source.read(item.filename).decode(),
+                        dropped))
+                else:
+                    target.writestr(item, source.read(item.filename))
+    saved = os.path.getsize(pptx_path) - os.path.getsize(packed_pptx)
+    os.replace(packed_pptx, pptx_path)
+    logger.info("Packed %s: %d media stored once out of %d, %.1f MB smaller", pptx_path,
+        len(packed), len(media), saved / 2 ** 20)
+
+
+def point_at_kept(xml, dropped):
+    """`xml` of a relationships or content types part, with the media it
+    referred to that are no longer stored replaced by the ones kept instead."""
+    for name, kept_name in dropped.items():
+        # content types may list every media part on its own
+        xml = re.sub(r'<Override[^>]*PartName="/ppt/media/{}"[^>]*/>'.format(re.escape(name)),
+            "", xml)
+        xml = xml.replace('media/{}"'.format(name), 'media/{}"'.format(kept_name))
+    return xml
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the media of a pptx.")
+    parser.add_argument("pptx", nargs="?", default=os.path.join("pptx", "Slides.pptx"))
+    parser.add_argument("--bitrate", type=parse_bitrate,
+        help="encode the movies over this many bits per second (4M, 800k) down to it")
+    args = parser.parse_args()
+    package(args.pptx, args.bitrate)
+
+
+if __name__ == "__main__":
+    main()
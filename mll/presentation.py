@@ -14,8 +14,14 @@ SGILO:
 from manim import *
 from manim_pptx import *
 
+from assets import ImageSequence, Prefetcher, load_image
+from connectors import TrackedLine
+from memory import BudgetedScene, memory_budget
+from rendering import DeckScene, MagnifiedScene
+from tex import math_tex, prepare_tex, tex, tex_cache
+
 import copy
-import itertools
+import sys
 
 screen_width = 13
 time_per_char = 0.05
@@ -28,6 +34,7 @@ caption_left_margin = 8
 
 factor: 0.5  # downsampling factor
 image_resolution = 2048
+sr_zoom_factor = 0.3
 text_margin = 8
 
 # generator 
@@ -49,6 +56,90 @@ def connect_shapes(obj1, obj2, color=WHITE):
     return arrow_up, arrow_down
 
 
+class GeneratorDiagram(VGroup):
+    """The layers of a generator, the G_i maps between them and the z_i labels."""
+
+    def __init__(self, num_layers, width, dist, color, **kwargs):
+        layers = []
+        z_texts = []
+        gen_texts = []
+        arrows = []
+        for index in range(num_layers):
+            layers.append(Rectangle(width=width, height=1.4**(index + 1)))
+            if index != 0:
+                layers[-1].next_to(layers[index - 1], dist * RIGHT)
+                arrows += connect_shapes(layers[-2], layers[-1], color=color)
+                gen_text = math_tex(r"G_{}".format(index), color=color)
+                gen_text.next_to(layers[-2], 2 * RIGHT)
+                gen_texts.append(gen_text)
+            else:
+                layers[0].align_on_border(LEFT).shift(1.8 * UP)
+            z_texts.append(math_tex(r"z_{}".format(index)).next_to(layers[-1], DOWN))
+        super().__init__(*layers, *z_texts, *gen_texts, *arrows, **kwargs)
+        self.layers = layers
+        self.z_texts = z_texts
+        self.gen_texts = gen_texts
+        self.arrows = arrows
+
+    def loss_loop(self, loss, x_image, target, loss_width=loss_width):
+        """Wires the output of the generator through x and `loss` back to `target`.
+
+        Returns the new mobjects, `loss` and `x_image` included.
+        """
+        layers = self.layers
+        loss_rec = Rectangle(height=loss_height, width=loss_width, color=loss_color)
+        loss_rec.next_to(0.5 * layers[1].get_center() + 
+            0.5 * layers[2].get_center(), 12 * DOWN + 0.25 * RIGHT)
+        loss.move_to(loss_rec.get_center())
+
+        # smooth connections
+        dot1 = Dot()
+        dot1.next_to(layers[-1], 10 * RIGHT)
+        x_text = math_tex(r"x")
+        x_text.next_to(dot1, UP)
+        x_image.next_to(x_text, RIGHT)
+
+        dot2 = Dot()
+        dot2.next_to(dot1, 12 * DOWN)
+        dot2.set_y(loss_rec.get_center()[1])
+
+        dot3 = Dot()
+        dot3 = dot3.next_to(dot2, LEFT)
+        rec_right_x = (0.5 * loss_rec.get_corner(RIGHT + UP) + 0.5 * loss_rec.get_corner(DOWN + RIGHT))[0]
+        dot3.set_x(rec_right_x)
+
+        n_arrows = []
+        things_to_connect = [layers[-1].get_center(), dot1, dot2, dot3]
+        for index in range(0, len(things_to_connect) - 1):
+            n_arrows.append(Arrow(start=things_to_connect[index], 
+                end=things_to_connect[index + 1]))
+
+        dot4 = Dot()
+        dot4.next_to(loss_rec, LEFT)
+        rec_left_x = (0.5 * loss_rec.get_corner(LEFT + UP) + 0.5 * loss_rec.get_corner(DOWN + LEFT))[0]
+        dot4.set_x(rec_left_x)
+
+        dot5 = Dot()
+        dot5.next_to(dot4, LEFT)
+        dot5.set_x(target.get_center()[0])
+
+        n_arrows.append(Arrow(start=dot4, end=dot5))
+        n_arrows.append(Arrow(start=dot5, end=target))
+
+        return [loss, loss_rec, dot1, dot2, dot3, dot4, dot5, *n_arrows, x_text, x_image]
+
+
+diagram_cache = {}
+
+
+def generator_diagram(num_layers=num_layers, width=gen_width, dist=layers_dist, color=gen_color):
+    # the MathTex labels are slow to build, so each layout is built once
+    key = (num_layers, width, dist, color)
+    if key not in diagram_cache:
+        diagram_cache[key] = GeneratorDiagram(num_layers, width, dist, color)
+    return diagram_cache[key].copy()
+
+
 def get_text_runtime(text):
     return len(text) * time_per_char
 
@@ -67,11 +158,11 @@ def split_lines(text, limit=30000):
     return " ".join(new_text)
         
 
-class Intro(PPTXScene):
+class Intro(DeckScene):
     def construct(self):
-        title = Tex(r"Generative Models for Reconstruction, Art and Things in Between")
+        title = tex(r"Generative Models for Reconstruction, Art and Things in Between")
         title.stretch_to_fit_width(screen_width)
-        subtitle = Tex(r"A short introduction to Intermediate Layer Optimization")
+        subtitle = tex(r"A short introduction to Intermediate Layer Optimization")
         subtitle.stretch_to_fit_width(0.8 * screen_width)
         VGroup(title, subtitle).arrange(DOWN)
         self.play(
@@ -84,16 +175,16 @@ class Intro(PPTXScene):
         self.endSlide()
 
 
-class Pandas(PPTXScene):
+class Pandas(DeckScene):
     def construct(self):
         gen_text = r"Generative models are {{impressive}}"
-        title = Tex(gen_text)
+        title = tex(gen_text)
         title.set_color_by_tex('impressive', RED)
         self.play(FadeIn(title, run_time=get_text_runtime(title)))
         self.wait()
         self.endSlide()
 
-        transform_title = Tex(gen_text)
+        transform_title = tex(gen_text)
         transform_title.set_color_by_tex('impressive', RED)
         transform_title.to_corner(UP + LEFT)
         self.play(
@@ -102,10 +193,10 @@ class Pandas(PPTXScene):
         self.wait()
         self.endSlide()
         
-        monkey_text = Tex(r"\textit{A toilet car}", font_size=caption_font_size, 
+        monkey_text = tex(r"\textit{A toilet car}", font_size=caption_font_size, 
             color=caption_color).to_corner(
                 UP + LEFT + np.array([0, caption_top_margin, 0]))
-        monkey_image = ImageMobject("images/toilet_car.jpeg", 
+        monkey_image = load_image("images/toilet_car.jpeg", 
             scale_to_resolution=image_resolution).shift(4 * LEFT + UP)
         monkey_image.next_to(monkey_text, UP)
 
@@ -116,11 +207,11 @@ class Pandas(PPTXScene):
 
 
 
-        pandas_text = Tex(r"\textit{Cute golden retriever puppy \\ wearing glasses and a suit}", font_size=caption_font_size, 
+        pandas_text = tex(r"\textit{Cute golden retriever puppy \\ wearing glasses and a suit}", font_size=caption_font_size, 
             color=caption_color).to_corner(
                 UP + LEFT + np.array([0, caption_top_margin, 0]))
         pandas_text.next_to(monkey_text, 8 * RIGHT)
-        pandas_image = ImageMobject("images/golden_retriever.jpeg", 
+        pandas_image = load_image("images/golden_retriever.jpeg", 
             scale_to_resolution=image_resolution).shift(4 * LEFT + UP)
         pandas_image.next_to(pandas_text, UP)
         self.play(FadeIn(pandas_text), FadeIn(pandas_image))
@@ -129,11 +220,11 @@ class Pandas(PPTXScene):
         self.endSlide()
 
 
-        picasso_text = Tex(r"\textit{Hyperrealistic painting of an \\ extraterrestrial  alien lovingly \\holding a rabbit}", font_size=caption_font_size, 
+        picasso_text = tex(r"\textit{Hyperrealistic painting of an \\ extraterrestrial  alien lovingly \\holding a rabbit}", font_size=caption_font_size, 
             color=caption_color).to_corner(
                 UP + LEFT + np.array([0, caption_top_margin, 0]))
         picasso_text.next_to(pandas_text, 8 * RIGHT)
-        picasso_image = ImageMobject("images/alien.jpeg", 
+        picasso_image = load_image("images/alien.jpeg", 
             scale_to_resolution=image_resolution).shift(4 * LEFT + UP)
         picasso_image.next_to(picasso_text, UP)
         self.play(FadeIn(picasso_text, picasso_image))
@@ -154,14 +245,14 @@ class Pandas(PPTXScene):
         self.endSlide()
 
         # StyleGAN photos
-        stylegan_face1 = ImageMobject("images/stylegan2.jpeg", 
+        stylegan_face1 = load_image("images/stylegan2.jpeg", 
             scale_to_resolution=1.20 * image_resolution).next_to(mobj, DOWN)
         stylegan_face1.align_to(title, LEFT)
         # self.play(FadeIn(stylegan_face1))
         # self.wait()
         # self.add(stylegan_face1)
 
-        stylegan_face2 = ImageMobject("images/stylegan3.jpeg", 
+        stylegan_face2 = load_image("images/stylegan3.jpeg", 
             scale_to_resolution=1.25 * image_resolution).next_to(stylegan_face1)
         stylegan_photos = Group(stylegan_face1, stylegan_face2)
         self.play(FadeIn(stylegan_face1), FadeIn(stylegan_face2))
@@ -169,7 +260,7 @@ class Pandas(PPTXScene):
         self.endSlide()
 
         gpt_text = r"``It is important for AI researchers to be aware of the potential biases in large generative models like GPT-3 and to take steps to mitigate these biases. \\ -- Written by GPT-3.''"
-        gpt_text = Tex(split_lines(gpt_text, limit=18), font_size=35, color=YELLOW)
+        gpt_text = tex(split_lines(gpt_text, limit=18), font_size=35, color=YELLOW)
         gpt_text.next_to(stylegan_photos, 2.0 * RIGHT + 0.5 * UP)
         self.play(FadeIn(gpt_text, run_time=3))
         self.wait()
@@ -178,16 +269,16 @@ class Pandas(PPTXScene):
 
 
 
-class Problem(PPTXScene):
+class Problem(DeckScene):
     def construct(self):
         gen_text = r"Generative models are {{impressive}}"
-        title = Tex(gen_text)
+        title = tex(gen_text)
         title.set_color_by_tex('impressive', RED)
         self.play(FadeIn(title, run_time=2))
         self.endSlide()
         useful_text = r"Are they {{useful}}?"
         title.set_color_by_tex('useful', RED)
-        useful_text = Tex(useful_text)
+        useful_text = tex(useful_text)
         
         self.remove(title)
         self.play(Create(useful_text))
@@ -195,7 +286,7 @@ class Problem(PPTXScene):
         self.endSlide()
 
         self.play(useful_text.animate.align_on_border(LEFT + UP))
-        problems_text = Tex(r"Examples of problems we care about:")
+        problems_text = tex(r"Examples of problems we care about:")
         problems_text.next_to(useful_text, 3 * DOWN).align_to(useful_text, LEFT)
         blist = BulletedList("Inpainting", "Denoising", "Accelerating MRI", height=2, width=4)
         blist.set_color_by_tex("Inpainting", RED)
@@ -208,11 +299,11 @@ class Problem(PPTXScene):
         
 
 
-class SuperResolution(ZoomedScene):
+class SuperResolution(MagnifiedScene):
     def __init__(self, **kwargs):
-        ZoomedScene.__init__(
+        MagnifiedScene.__init__(
             self,
-            zoom_factor=0.3,
+            zoom_factor=sr_zoom_factor,
             zoomed_display_height=1,
             zoomed_display_width=6,
             image_frame_stroke_width=20,
@@ -223,16 +314,16 @@ class SuperResolution(ZoomedScene):
         )
 
     def construct(self):
-        image = ImageMobject("downsampled_white.jpg", 
+        image = load_image("downsampled_white.jpg", 
             scale_to_resolution=image_resolution)
         self.add(image)
         self.wait()
 
-        aligned = ImageMobject("downsampled_white.jpg", 
+        aligned = load_image("downsampled_white.jpg", zoom=1 / sr_zoom_factor,
             scale_to_resolution=2.00 * image_resolution).align_on_border(LEFT)
 
 
-        clean_image = ImageMobject("test_image.jpg", 
+        clean_image = load_image("test_image.jpg", zoom=1 / sr_zoom_factor,
             scale_to_resolution=1.00 * image_resolution).next_to(aligned, RIGHT * 8)
 
         
@@ -294,27 +385,17 @@ class SuperResolution(ZoomedScene):
 
 
 
-class Generator(PPTXScene):
+class Generator(DeckScene):
     def construct(self):
-        layers = []
-        for index in range(num_layers):
-            layers.append(Rectangle(width=gen_width, height=1.4**(index + 1)))
-            if index != 0:
-                layers[-1].next_to(layers[index - 1], layers_dist * RIGHT)
-                text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                arrow_up, arrow_down = connect_shapes(layers[-2], layers[-1], 
-                    color=gen_color)
-                gen_text = MathTex(r"G_{}".format(index), color=gen_color)
-                gen_text.next_to(layers[-2], 2 * RIGHT)
-                # gen_text.set(0.5 * layers[-2].get_center() + 
-                #     0.5 * layers[-1].get_center())
-                self.play(FadeIn(layers[-1]),
-                    FadeIn(arrow_up), FadeIn(arrow_down),
-                    Create(text), Create(gen_text))
-            else:
-                layers[0].align_on_border(LEFT).shift(1.8 * UP)
-                first_text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                self.play(FadeIn(layers[0]), Create(first_text))
+        diagram = generator_diagram()
+        layers = diagram.layers
+        first_text = diagram.z_texts[0]
+        self.play(FadeIn(layers[0]), Create(first_text))
+        for index in range(1, num_layers):
+            arrow_up, arrow_down = diagram.arrows[2 * index - 2:2 * index]
+            self.play(FadeIn(layers[index]),
+                FadeIn(arrow_up), FadeIn(arrow_down),
+                Create(diagram.z_texts[index]), Create(diagram.gen_texts[index - 1]))
         generator = VGroup(*layers)
         self.add(generator)
         self.wait()
@@ -324,24 +405,17 @@ class Generator(PPTXScene):
         ax = Axes(x_range=[0, 10])[0]
         ax.align_on_border(LEFT + DOWN)
 
-        dot = Dot(ax.get_center(), color=BLUE)
+        tracker_end = 5
         value_tracker = ValueTracker(0)
-        dot.add_updater(lambda z: z.set_x(value_tracker.get_value()))
-
+        # the dot is animated along with the tracker instead of following it
+        dot = Dot(ax.get_center(), color=BLUE).set_x(value_tracker.get_value())
 
-        line = Line(first_text, dot.get_center())
-        line.add_updater(lambda z: z.become(Line(dot.get_center(), first_text)))
+        line = TrackedLine(dot.get_center, first_text)
 
-        image_paths = itertools.cycle(sorted(['images/interpolations/' + x for x in os.listdir('images/interpolations')]))
-
-        image = ImageMobject(next(image_paths), 
-            scale_to_resolution=0.6 * image_resolution).next_to(layers[-1], RIGHT * 4)        
-        def image_updater(z):
-            nonlocal image
-            new_image = ImageMobject(next(image_paths), 
-                scale_to_resolution=0.6 * image_resolution).next_to(layers[-1], RIGHT * 4)
-            image.pixel_array = new_image.pixel_array
-        image.add_updater(image_updater)
+        image = ImageSequence("images/interpolations", 
+            scale_to_resolution=0.6 * image_resolution).next_to(layers[-1], RIGHT * 4)
+        # the interpolation follows the tracker, not the frame rate
+        image.add_updater(lambda z: z.set_progress(value_tracker.get_value() / tracker_end))
 
         # def first_text_updater(z):
         #     nonlocal first_text
@@ -353,89 +427,22 @@ class Generator(PPTXScene):
         self.endSlide()
 
 
-        self.play(value_tracker.animate.set_value(5), run_time=4)
+        self.play(value_tracker.animate.set_value(tracker_end),
+            dot.animate.set_x(tracker_end), run_time=4)
         self.wait()
         self.endSlide()
 
 
-class CSGM(PPTXScene):
+class CSGM(DeckScene):
     def construct(self):
-        layers = []
-        arrows = []
-        texts = []
-        for index in range(num_layers):
-            layers.append(Rectangle(width=gen_width, height=1.4**(index + 1)))
-            if index != 0:
-                layers[-1].next_to(layers[index - 1], layers_dist * RIGHT)
-                text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                arrow_up, arrow_down = connect_shapes(layers[-2], layers[-1], 
-                    color=gen_color)
-                arrows.append(arrow_up)
-                arrows.append(arrow_down)
-                gen_text = MathTex(r"G_{}".format(index), color=gen_color)
-                gen_text.next_to(layers[-2], 2 * RIGHT)
-                self.add(layers[-1],
-                    arrow_up, arrow_down,
-                    text, gen_text)
-                texts.append(gen_text)
-                texts.append(text)
-            else:
-                layers[0].align_on_border(LEFT).shift(1.8 * UP)
-                first_text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                self.add(layers[0], first_text)
-                texts.append(first_text)
-        generator = VGroup(*layers, *texts, *arrows)
+        generator = generator_diagram()
         self.play(FadeIn(generator))
         self.wait()
         self.endSlide()
 
-        loss = MathTex(r"\left|\left|G_3G_2G_1(z_0) - x\right|\right|^2")
-        loss_rec = Rectangle(height=loss_height, width=loss_width, color=loss_color)
-        loss_rec.next_to(0.5 * layers[1].get_center() + 
-            0.5 * layers[2].get_center(), 12 * DOWN + 0.25 * RIGHT)
-        loss.move_to(loss_rec.get_center())
-
-
-        # smooth connections
-        dot1 = Dot()
-        dot1.next_to(layers[-1], 10 * RIGHT)
-        x_text = MathTex(r"x")
-        x_text.next_to(dot1, UP)
-
-        x_image = ImageMobject("images/alex_real.png", scale_to_resolution=1.00 * image_resolution)
-        x_image.next_to(x_text, RIGHT)
-
-        dot2 = Dot()
-        dot2.next_to(dot1, 12 * DOWN)
-        dot2.set_y(loss_rec.get_center()[1])
-
-        dot3 = Dot()
-        dot3 = dot3.next_to(dot2, LEFT)
-        rec_right_x = (0.5 * loss_rec.get_corner(RIGHT + UP) + 0.5 * loss_rec.get_corner(DOWN + RIGHT))[0]
-        dot3.set_x(rec_right_x)
-
-
-
-        n_arrows = []
-        things_to_connect = [layers[-1].get_center(), dot1, dot2, dot3]
-        for index in range(0, len(things_to_connect) - 1):
-            n_arrows.append(Arrow(start=things_to_connect[index], 
-                end=things_to_connect[index + 1]))
-        
-        dot4 = Dot()
-        dot4.next_to(loss_rec, LEFT)
-        rec_left_x = (0.5 * loss_rec.get_corner(LEFT + UP) + 0.5 * loss_rec.get_corner(DOWN + LEFT))[0]
-        dot4.set_x(rec_left_x)
-        
-        dot5 = Dot()
-        dot5.next_to(dot4, LEFT)
-        dot5.set_x(first_text.get_center()[0])
-
-        n_arrows.append(Arrow(start=dot4, end=dot5))
-        n_arrows.append(Arrow(start=dot5, end=first_text))
-
-
-        scene_components = [loss, loss_rec, dot1, dot2, dot3, dot4, dot5, *n_arrows, x_text, x_image]
+        loss = math_tex(r"\left|\left|G_3G_2G_1(z_0) - x\right|\right|^2")
+        x_image = load_image("images/alex_real.png", scale_to_resolution=1.00 * image_resolution)
+        scene_components = generator.loss_loop(loss, x_image, generator.z_texts[0])
         self.play(*[FadeIn(x) for x in scene_components])
         self.wait()
         self.endSlide()
@@ -452,8 +459,8 @@ class CSGM(PPTXScene):
         self.wait()
         self.endSlide()
 
-        rec_text = MathTex(r"G(z_0*)", color=YELLOW)
-        rec_image = ImageMobject("images/alex_csgm.png", scale_to_resolution=0.5 * image_resolution)
+        rec_text = math_tex(r"G(z_0*)", color=YELLOW)
+        rec_image = load_image("images/alex_csgm.png", scale_to_resolution=0.5 * image_resolution)
         rec_image.move_to(np.array([3., 0., 0.]))
         rec_text.next_to(rec_image, DOWN)
         self.play(FadeIn(rec_image), FadeIn(rec_text))
@@ -467,84 +474,16 @@ class CSGM(PPTXScene):
 
 
         ###### ILO
-        ilo_tex = Tex(r"Intermediate Layer Optimization")
+        ilo_tex = tex(r"Intermediate Layer Optimization")
         ilo_tex.align_on_border(UP + LEFT)
         ax = Axes(x_range=[0, 10])[0]
         ax.align_on_border(LEFT + DOWN)
 
-        layers = []
-        arrows = []
-        texts = []
-        for index in range(num_layers):
-            layers.append(Rectangle(width=gen_width, height=1.4**(index + 1)))
-            if index != 0:
-                layers[-1].next_to(layers[index - 1], layers_dist * RIGHT)
-                text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                arrow_up, arrow_down = connect_shapes(layers[-2], layers[-1], 
-                    color=gen_color)
-                arrows.append(arrow_up)
-                arrows.append(arrow_down)
-                gen_text = MathTex(r"G_{}".format(index), color=gen_color)
-                gen_text.next_to(layers[-2], 2 * RIGHT)
-                self.add(layers[-1],
-                    arrow_up, arrow_down,
-                    text, gen_text)
-                texts.append(gen_text)
-                texts.append(text)
-            else:
-                layers[0].align_on_border(LEFT).shift(1.8 * UP)
-                first_text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                self.add(layers[0], first_text)
-                texts.append(first_text)
-        generator = VGroup(*layers, *texts, *arrows)
-
-        loss = MathTex(r"\left|\left|G_2G_1(z_1) - x\right|\right|^2")
-        loss_rec = Rectangle(height=loss_height, width=loss_width, color=loss_color)
-        loss_rec.next_to(0.5 * layers[1].get_center() + 
-            0.5 * layers[2].get_center(), 12 * DOWN + 0.25 * RIGHT)
-        loss.move_to(loss_rec.get_center())
+        generator = generator_diagram()
 
-
-        # smooth connections
-        dot1 = Dot()
-        dot1.next_to(layers[-1], 10 * RIGHT)
-        x_text = MathTex(r"x")
-        x_text.next_to(dot1, UP)
-
-        x_image = ImageMobject("images/alex_real.png", scale_to_resolution=1.00 * image_resolution)
-        x_image.next_to(x_text, RIGHT)
-
-        dot2 = Dot()
-        dot2.next_to(dot1, 12 * DOWN)
-        dot2.set_y(loss_rec.get_center()[1])
-
-        dot3 = Dot()
-        dot3 = dot3.next_to(dot2, LEFT)
-        rec_right_x = (0.5 * loss_rec.get_corner(RIGHT + UP) + 0.5 * loss_rec.get_corner(DOWN + RIGHT))[0]
-        dot3.set_x(rec_right_x)
-
-
-
-        n_arrows = []
-        things_to_connect = [layers[-1].get_center(), dot1, dot2, dot3]
-        for index in range(0, len(things_to_connect) - 1):
-            n_arrows.append(Arrow(start=things_to_connect[index], 
-                end=things_to_connect[index + 1]))
-        
-        dot4 = Dot()
-        dot4.next_to(loss_rec, LEFT)
-        rec_left_x = (0.5 * loss_rec.get_corner(LEFT + UP) + 0.5 * loss_rec.get_corner(DOWN + LEFT))[0]
-        dot4.set_x(rec_left_x)
-        
-        dot5 = Dot()
-        dot5.next_to(dot4, LEFT)
-        dot5.set_x(texts[2].get_center()[0])
-
-        n_arrows.append(Arrow(start=dot4, end=dot5))
-        n_arrows.append(Arrow(start=dot5, end=texts[2]))
-
-
-        scene_components = [loss, loss_rec, dot1, dot2, dot3, dot4, dot5, *n_arrows, x_text, x_image]
+        loss = math_tex(r"\left|\left|G_2G_1(z_1) - x\right|\right|^2")
+        x_image = load_image("images/alex_real.png", scale_to_resolution=1.00 * image_resolution)
+        scene_components = generator.loss_loop(loss, x_image, generator.z_texts[1])
         n_mobj = Group(generator, *scene_components)        
 
 
@@ -563,8 +502,8 @@ class CSGM(PPTXScene):
         self.wait()
         self.endSlide()
 
-        rec_text = MathTex(r"G_2G_1(z_1*)", color=YELLOW)
-        rec_image = ImageMobject("images/alex_fake.png", scale_to_resolution=1.5 * image_resolution)
+        rec_text = math_tex(r"G_2G_1(z_1*)", color=YELLOW)
+        rec_image = load_image("images/alex_fake.png", scale_to_resolution=1.5 * image_resolution)
         rec_image.move_to(np.array([2., 0., 0.]))
         rec_text.next_to(rec_image, DOWN)
         self.play(FadeIn(rec_image), FadeIn(rec_text))
@@ -573,117 +512,50 @@ class CSGM(PPTXScene):
         # self.wait()
 
 
-class Regularization(PPTXScene):
+class Regularization(DeckScene):
     def construct(self):
-        text = Tex(r"The issue of regularization", color=YELLOW)
+        text = tex(r"The issue of regularization", color=YELLOW)
         text.align_on_border(UP + LEFT)
 
-        image1 = ImageMobject("images/alex_inp.png", scale_to_resolution=0.5 * image_resolution)
+        image1 = load_image("images/alex_inp.png", scale_to_resolution=0.5 * image_resolution)
         image1.move_to(np.array([-2.0, 0.0, 0.0]))
         self.play(FadeIn(text), FadeIn(image1))
         self.wait()
         self.endSlide()
         
-        image2 = ImageMobject("images/alex_inp_failure.png", scale_to_resolution=0.5 * image_resolution)
+        image2 = load_image("images/alex_inp_failure.png", scale_to_resolution=0.5 * image_resolution)
         image2.move_to(np.array([2.0, 0.0, 0.0]))
         self.play(FadeIn(image2))
         self.wait()
         self.endSlide()
         
-class SGILO(PPTXScene):
+class SGILO(DeckScene):
     def construct(self):
-        ilo_tex = Tex(r"Score Guided Intermediate Layer Optimization")
+        ilo_tex = tex(r"Score Guided Intermediate Layer Optimization")
         ilo_tex.align_on_border(UP + LEFT)
         ax = Axes(x_range=[0, 10])[0]
         ax.align_on_border(LEFT + DOWN)
 
-        layers = []
-        arrows = []
-        texts = []
-        for index in range(num_layers):
-            layers.append(Rectangle(width=gen_width, height=1.4**(index + 1)))
-            if index != 0:
-                layers[-1].next_to(layers[index - 1], layers_dist * RIGHT)
-                text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                arrow_up, arrow_down = connect_shapes(layers[-2], layers[-1], 
-                    color=gen_color)
-                arrows.append(arrow_up)
-                arrows.append(arrow_down)
-                gen_text = MathTex(r"G_{}".format(index), color=gen_color)
-                gen_text.next_to(layers[-2], 2 * RIGHT)
-                self.add(layers[-1],
-                    arrow_up, arrow_down,
-                    text, gen_text)
-                texts.append(gen_text)
-                texts.append(text)
-            else:
-                layers[0].align_on_border(LEFT).shift(1.8 * UP)
-                first_text = MathTex(r"z_{}".format(index)).next_to(layers[-1], DOWN)
-                self.add(layers[0], first_text)
-                texts.append(first_text)
-        generator = VGroup(*layers, *texts, *arrows)
-
-        loss = MathTex(r"\left|\left|G_2G_1(z_1) - x\right|\right|^2 + \\ - \lambda \log p_{\theta}(z_1)")
-        loss_rec = Rectangle(height=loss_height, width=1.2 * loss_width, color=loss_color)
-        loss_rec.next_to(0.5 * layers[1].get_center() + 
-            0.5 * layers[2].get_center(), 12 * DOWN + 0.25 * RIGHT)
-        loss.move_to(loss_rec.get_center())
-
-
-        # smooth connections
-        dot1 = Dot()
-        dot1.next_to(layers[-1], 10 * RIGHT)
-        x_text = MathTex(r"x")
-        x_text.next_to(dot1, UP)
-
-        x_image = ImageMobject("images/alex_inp.png", scale_to_resolution=1.00 * image_resolution)
-        x_image.next_to(x_text, RIGHT)
-
-        dot2 = Dot()
-        dot2.next_to(dot1, 12 * DOWN)
-        dot2.set_y(loss_rec.get_center()[1])
-
-        dot3 = Dot()
-        dot3 = dot3.next_to(dot2, LEFT)
-        rec_right_x = (0.5 * loss_rec.get_corner(RIGHT + UP) + 0.5 * loss_rec.get_corner(DOWN + RIGHT))[0]
-        dot3.set_x(rec_right_x)
-
-
+        generator = generator_diagram()
 
-        n_arrows = []
-        things_to_connect = [layers[-1].get_center(), dot1, dot2, dot3]
-        for index in range(0, len(things_to_connect) - 1):
-            n_arrows.append(Arrow(start=things_to_connect[index], 
-                end=things_to_connect[index + 1]))
-        
-        dot4 = Dot()
-        dot4.next_to(loss_rec, LEFT)
-        rec_left_x = (0.5 * loss_rec.get_corner(LEFT + UP) + 0.5 * loss_rec.get_corner(DOWN + LEFT))[0]
-        dot4.set_x(rec_left_x)
-        
-        dot5 = Dot()
-        dot5.next_to(dot4, LEFT)
-        dot5.set_x(texts[2].get_center()[0])
-
-        n_arrows.append(Arrow(start=dot4, end=dot5))
-        n_arrows.append(Arrow(start=dot5, end=texts[2]))
-
-
-        scene_components = [loss, loss_rec, dot1, dot2, dot3, dot4, dot5, *n_arrows, x_text, x_image]
+        loss = math_tex(r"\left|\left|G_2G_1(z_1) - x\right|\right|^2 + \\ - \lambda \log p_{\theta}(z_1)")
+        x_image = load_image("images/alex_inp.png", scale_to_resolution=1.00 * image_resolution)
+        scene_components = generator.loss_loop(loss, x_image, generator.z_texts[1],
+            loss_width=1.2 * loss_width)
         mobj = Group(generator, *scene_components)
         self.play(FadeIn(mobj))  
         self.wait()
         self.endSlide()
 
 
-class Results(PPTXScene):
+class Results(DeckScene):
     def construct(self):
-        text = Tex(r"Results", color=YELLOW)
+        text = tex(r"Results", color=YELLOW)
         text.align_on_border(UP + LEFT)
         
-        image1 = ImageMobject("images/posterior.png", scale_to_resolution=0.5 * image_resolution)
+        image1 = load_image("images/posterior.png", scale_to_resolution=0.5 * image_resolution)
         image1.move_to(np.array([-2.0, 0.0, 0.0]))
-        text1 = Tex(r"Super-resolution with posterior sampling", font_size=30)
+        text1 = tex(r"Super-resolution with posterior sampling", font_size=30)
         text1.next_to(image1, DOWN)
         self.play(FadeIn(text), FadeIn(image1), FadeIn(text1))
         self.wait()
@@ -697,18 +569,18 @@ class Results(PPTXScene):
         self.wait()
         self.endSlide()
 
-        image2 = ImageMobject("images/ilo_inp.png", scale_to_resolution=1.6 * image_resolution)
+        image2 = load_image("images/ilo_inp.png", scale_to_resolution=1.6 * image_resolution)
         image2.next_to(image1, RIGHT)
-        text2 = Tex(r"Inpainting", font_size=30)
+        text2 = tex(r"Inpainting", font_size=30)
         text2.next_to(image2, DOWN)
         self.play(FadeIn(image2), FadeIn(text2))
         self.wait()
         group2 = Group(image2, text2)
         self.endSlide()
 
-        image3 = ImageMobject("images/frog.png", scale_to_resolution=1.3 * image_resolution)
+        image3 = load_image("images/frog.png", scale_to_resolution=1.3 * image_resolution)
         image3.next_to(image2, 5 * DOWN + LEFT)
-        text3 = Tex(r"Converting humans to frogs", font_size=30)
+        text3 = tex(r"Converting humans to frogs", font_size=30)
         text3.next_to(image3, DOWN)
         self.play(FadeIn(image3), FadeIn(text3))
         self.wait()
@@ -728,17 +600,24 @@ slides = [
 ]
 
 
-class Slides(*slides):
+class Slides(BudgetedScene, *slides):
 
     def setup(self):
+        # compile every tex string of the deck in one go
+        prepare_tex(sys.modules[__name__])
         # setup each scene
         for s in slides:
             s.setup(self)
 
     def construct(self):
-        # play each scene
-        for s in slides:
+        # play each scene, decoding the images of the next one meanwhile
+        prefetcher = Prefetcher(__file__)
+        for index, s in enumerate(slides):
+            for upcoming in slides[index:index + 2]:
+                prefetcher.prefetch(upcoming.__name__)
             s.construct(self)
             # if there are any objects left at the end of the animation, remove them!
             if len(self.mobjects) >= 1:
-                self.remove(*self.mobjects)
\ No newline at end of file
+                self.remove(*self.mobjects)
+            memory_budget.end_scene(self, s.__name__)
+        logger.info(tex_cache.summary())
@@ -0,0 +1,183 @@
+"""Opt-in timing of the deck's renders.
+
+    DECK_PROFILE=profile.json manim -ql presentation.py Slides
+
+records, for every endSlide section of every scene, the wall time, the frames
+written, the time spent in each updater and, for each play call, how long went
+to interpolating the animations, rasterizing and encoding, along with the peak
+resident memory. The report is written as JSON and logged as a table.
+"""
+from manim import logger
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+# play categories, in the order of the summary table
+play_categories = ("interpolate", "updaters", "rasterize", "encode")
+
+
+def updater_name(updater):
+    code = getattr(updater, "__code__", None)
+    if code is None:
+        return repr(updater)
+    return "{}:{}".format(getattr(updater, "__qualname__", code.co_name), code.co_firstlineno)
+
+
+def peak_rss():
+    # in MB; ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Profiler:
+
+    def __init__(self, path=None):
+        self.path = path
+        self.updater_wrappers = {}
+        self.reset()
+
+    def reset(self):
+        self.sections = []
+        self.start_section()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def start_section(self):
+        self.section_start = time.perf_counter()
+        self.totals = collections.defaultdict(float)
+        self.updaters = collections.defaultdict(float)
+        self.plays = []
+        self.frames = 0
+        self.current_play = None
+
+    def add(self, category, seconds):
+        # only the render thread, not the prefetcher's
+        if not self.enabled or threading.current_thread() is not threading.main_thread():
+            return
+        self.totals[category] += seconds
+        if self.current_play is not None:
+            self.current_play[category] = self.current_play.get(category, 0) + seconds
+
+    @contextlib.contextmanager
+    def timed(self, category):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(category, time.perf_counter() - start)
+
+    def add_frames(self, count):
+        self.frames += count
+        if self.current_play is not None:
+            self.current_play["frames"] += count
+
+    def timed_updater(self, updater):
+        """`updater`, wrapped to add its run time to the report.
+
+        The wrapper keeps the signature of the updater, so that manim still
+        passes dt to the updaters that take it.
+        """
+        if updater not in self.updater_wrappers:
+            name = updater_name(updater)
+
+            @functools.wraps(updater)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return updater(*args, **kwargs)
+                finally:
+                    seconds = time.perf_counter() - start
+                    self.updaters[name] += seconds
+                    self.add("updaters", seconds)
+
+            self.updater_wrappers[updater] = timed
+        return self.updater_wrappers[updater]
+
+    @contextlib.contextmanager
+    def recording_play(self, animations):
+        if not self.enabled or self.current_play is not None:
+            yield
+            return
+        self.current_play = {
+            "animations": [type(animation).__name__ for animation in animations],
+            "frames": 0,
+        }
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            play = self.current_play
+            self.current_play = None
+            play["total"] = time.perf_counter() - start
+            # updaters run as part of every interpolation step
+            if "interpolate" in play:
+                play["interpolate"] -= play.get("updaters", 0)
+            self.plays.append(play)
+
+    def end_section(self, scene, slide):
+        wall = time.perf_counter() - self.section_start
+        totals = dict(self.totals)
+        if "interpolate" in totals:
+            totals["interpolate"] -= totals.get("updaters", 0)
+        # building mobjects, tex, images: everything outside of play calls
+        totals["construct"] = wall - sum(play["total"] for play in self.plays)
+        self.sections.append({
+            "scene": scene,
+            "slide": slide,
+            "wall": wall,
+            "frames": self.frames,
+            "peak_rss_mb": peak_rss(),
+            "totals": totals,
+            "updaters": dict(self.updaters),
+            "plays": self.plays,
+        })
+        self.start_section()
+
+    def finish(self, scene):
+        # plays after the last endSlide still cost time
+        if self.plays:
+            self.end_section(scene, None)
+
+    def summary(self, sections=None):
+        sections = self.sections if sections is None else sections
+        columns = ("scene", "slide", "wall", "frames") + play_categories \
+            + ("construct", "tex", "images", "rss MB")
+        rows = [columns]
+        for section in sections:
+            totals = section["totals"]
+            rows.append((section["scene"], "-" if section["slide"] is None else section["slide"],
+                "{:.2f}".format(section["wall"]), section["frames"])
+                + tuple("{:.2f}".format(totals.get(c, 0))
+                    for c in play_categories + ("construct", "tex", "images"))
+                + ("{:.0f}".format(section["peak_rss_mb"]),))
+        widths = [max(len(str(row[i])) for row in rows) for i in range(len(columns))]
+        lines = ["  ".join(str(v).rjust(w) for v, w in zip(row, widths)) for row in rows]
+
+        updaters = collections.defaultdict(float)
+        for section in sections:
+            for name, seconds in section["updaters"].items():
+                updaters[name] += seconds
+        if updaters:
+            lines.append("")
+            lines.append("slowest updaters:")
+            for name, seconds in sorted(updaters.items(), key=lambda x: -x[1])[:10]:
+                lines.append("  {:8.2f}s  {}".format(seconds, name))
+        return "\n".join(lines)
+
+    def write(self, sections=None):
+        sections = self.sections if sections is None else sections
+        with open(self.path, "w") as f:
+            json.dump(sections, f, indent=4)
+        logger.info("Profile written to %s\n%s", self.path, self.summary(sections))
+
+
+profiler = Profiler(os.environ.get("DECK_PROFILE"))
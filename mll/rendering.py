@@ -0,0 +1,573 @@
+"""Rendering tweaks shared by the scenes of the deck.
+
+Every scene of the deck derives from DeckScene, which renders with a
+DeckRenderer instead of manim's stock CairoRenderer. A frame whose mobjects
+would be drawn exactly as in the previous one, during a wait with updaters
+that moved nothing for instance, is not rasterized again: the encoder gets
+the previous frame once more.
+
+With DECK_STREAM=1, frames are piped into one encoder per slide instead of one
+partial movie per play: each endSlide closes the current segment, and the
+slides of the pptx point at their segment directly.
+
+With DECK_RESOLUTIONS=854x480,3840x2160, every frame is also drawn at each of
+those sizes, by cameras of their own that share the scene state of the main
+one, and written by encoders of their own into the movie directories of those
+sizes. Construct, updaters, interpolation and decoding run once for them all;
+the pptx keeps the main resolution.
+
+Both need manim's partial movie cache off, with --disable_caching; deck.py
+turns it off itself.
+
+MagnifiedScene is a ZoomedScene whose zoomed camera only draws what lies under
+its frame, see MagnifierCamera.
+"""
+from manim import *
+from manim_pptx import *
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.scene.scene_file_writer import SceneFileWriter
+from manim.utils.family import extract_mobject_family_members
+from manim.utils.file_ops import is_png_format, write_to_movie
+from manim.utils.iterables import list_update
+
+import contextlib
+import copy
+import hashlib
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+from interpolation import batch_animations
+from profiling import profiler
+
+stream_slides = os.environ.get("DECK_STREAM") == "1"
+
+
+def parse_resolutions(value):
+    """[(width, height)] of a "854x480,3840x2160" list of sizes."""
+    return [tuple(int(n) for n in size.split("x")) for size in value.split(",") if size]
+
+
+# sizes written next to the one of the quality
+extra_resolutions = parse_resolutions(os.environ.get("DECK_RESOLUTIONS", ""))
+
+
+@contextlib.contextmanager
+def resolution(width, height):
+    """Points manim's config at another output size."""
+    saved = config.pixel_width, config.pixel_height
+    config.pixel_width, config.pixel_height = width, height
+    try:
+        yield
+    finally:
+        config.pixel_width, config.pixel_height = saved
+
+
+def drawn_state(mobjects):
+    """What `mobjects` look like when drawn, in drawing order: equal states
+    draw the same pixels. None when one of them cannot tell."""
+    state = []
+    for mob in mobjects:
+        state += [id(mob), mob.points.tobytes()]
+        if isinstance(mob, VMobject):
+            state += [mob.fill_rgbas.tobytes(), mob.stroke_rgbas.tobytes(),
+                mob.background_stroke_rgbas.tobytes(), mob.stroke_width,
+                mob.background_stroke_width, mob.sheen_factor, tuple(mob.sheen_direction)]
+        elif isinstance(mob, AbstractImageMobject):
+            # pixels shared with the asset cache are never written to, an
+            # ImageSequence counts the writes to its own
+            pixels = None if mob.pixel_array.flags.writeable else id(mob.pixel_array)
+            if pixels is None and hasattr(mob, "pixels_state"):
+                pixels = mob.pixels_state()
+            if pixels is None:
+                return None
+            state.append(pixels)
+        else:
+            return None
+    return state
+
+
+def state_digest(scene):
+    """Hash of what `scene` shows, to check that a replay reaches the state a
+    render did. Rounded, as a skipped play runs its updaters in one step."""
+    digest = hashlib.sha1()
+    mobjects = list_update(scene.mobjects, scene.foreground_mobjects)
+    for mob in scene.renderer.camera.get_mobjects_to_display(mobjects):
+        digest.update(type(mob).__name__.encode())
+        # + 0.0 turns -0.0 into 0.0
+        digest.update((np.round(mob.points, 4) + 0.0).tobytes())
+        if isinstance(mob, VMobject):
+            for rgbas in (mob.fill_rgbas, mob.stroke_rgbas):
+                digest.update((np.round(rgbas, 4) + 0.0).tobytes())
+        elif isinstance(mob, AbstractImageMobject):
+            digest.update(np.ascontiguousarray(mob.pixel_array).tobytes())
+    frame = getattr(scene.renderer.camera, "frame", None)
+    if frame is not None:
+        digest.update((np.round(frame.points, 4) + 0.0).tobytes())
+    return digest.hexdigest()
+
+
+class DeckFileWriter(SceneFileWriter):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.streaming = stream_slides
+        self.segments = []
+        self.segment_open = False
+        self.resolution = (config.pixel_width, config.pixel_height)
+        # writers of the same frames at other sizes, see DeckRenderer.init_scene
+        self.mirrors = []
+        self.is_mirror = False
+        # off in deck.py's workers that render part of a scene, see finish
+        self.combine = True
+
+    def add_partial_movie_file(self, hash_animation):
+        for mirror in self.mirrors:
+            mirror.add_partial_movie_file(hash_animation)
+        super().add_partial_movie_file(hash_animation)
+
+    def open_movie_pipe(self, file_path=None):
+        # ffmpeg is told the frame size from the config
+        with resolution(*self.resolution):
+            super().open_movie_pipe(file_path)
+
+    def begin_animation(self, allow_write=False, file_path=None):
+        for mirror in self.mirrors:
+            mirror.begin_animation(allow_write)
+        if not self.streaming:
+            return super().begin_animation(allow_write, file_path)
+        if allow_write and write_to_movie() and not self.segment_open:
+            self.open_movie_pipe(file_path=self.partial_movie_directory / "segment_{:05d}{}".format(
+                len(self.segments), config["movie_file_extension"]))
+            self.segment_open = True
+
+    def end_animation(self, allow_write=False):
+        for mirror in self.mirrors:
+            mirror.end_animation(allow_write)
+        # the segment stays open until the end of the slide
+        if not self.streaming:
+            # waits for ffmpeg to finish the partial movie
+            with profiler.timed("encode"):
+                super().end_animation(allow_write)
+
+    def cut_segment(self):
+        """Closes the segment of the current slide, returns its index."""
+        for mirror in self.mirrors:
+            mirror.cut_segment()
+        path = None
+        if self.segment_open:
+            with profiler.timed("encode"):
+                self.close_movie_pipe()
+            path = str(self.partial_movie_file_path)
+            self.segment_open = False
+        self.segments.append(path)
+        return len(self.segments) - 1
+
+    def write_frame(self, frame):
+        with profiler.timed("encode"):
+            if write_to_movie() and not is_png_format():
+                # straight from the frame's memory, without a bytes copy
+                self.writing_process.stdin.write(frame.data)
+            else:
+                super().write_frame(frame)
+        # the mirrors write the same frames again
+        if not self.is_mirror:
+            profiler.add_frames(1)
+
+    def finish(self):
+        # the main movie last, its path is the one manim reports
+        for mirror in self.mirrors:
+            mirror.finish()
+        if self.streaming:
+            # frames after the last endSlide
+            if self.segment_open:
+                self.cut_segment()
+            self.partial_movie_files = self.segments
+        if not self.combine:
+            # a movie of part of the scene is of no use, and other workers are
+            # still writing into the partial movie directory that manim would clean
+            if hasattr(self, "writing_process"):
+                self.writing_process.terminate()
+            return
+        super().finish()
+
+
+class DeckRenderer(CairoRenderer):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.foreground_layer = None
+        self.drawn_state = None
+        self.outputs = []
+
+    def init_scene(self, scene):
+        super().init_scene(scene)
+        self.scene = scene
+        self.outputs = []
+        for width, height in extra_resolutions:
+            if (width, height) == (self.camera.pixel_width, self.camera.pixel_height):
+                continue
+            # a shallow copy shares the frame of moving cameras and the
+            # sub cameras of zoomed scenes with the main camera
+            camera = copy.copy(self.camera)
+            camera.pixel_width, camera.pixel_height = width, height
+            camera.pixel_array_to_cairo_context = {}
+            camera.init_background()
+            camera.reset()
+            with resolution(width, height):
+                file_writer = self._file_writer_class(self, type(scene).__name__)
+            file_writer.is_mirror = True
+            self.file_writer.mirrors.append(file_writer)
+            self.outputs.append({"camera": camera, "file_writer": file_writer,
+                "static_image": None, "foreground_layer": None, "drawn_state": None})
+
+    @contextlib.contextmanager
+    def drawing_to(self, output):
+        """Points the renderer at the camera and file writer of `output`."""
+        keys = ("camera", "file_writer", "static_image", "foreground_layer", "drawn_state")
+        main = {key: getattr(self, key) for key in keys}
+        time = self.time
+        for key in keys:
+            setattr(self, key, output[key])
+        try:
+            yield
+        finally:
+            for key in keys:
+                output[key] = getattr(self, key)
+                setattr(self, key, main[key])
+            # the frames of the other outputs are the same moments again
+            self.time = time
+
+    def each_output(self):
+        """Points the renderer at every output in turn, the main one first."""
+        yield
+        for output in self.outputs:
+            with self.drawing_to(output):
+                yield
+
+    def play(self, scene, *args, **kwargs):
+        super().play(scene, *args, **kwargs)
+        self.foreground_layer = None
+        for output in self.outputs:
+            output["foreground_layer"] = None
+
+    def release(self):
+        """Drops the frames kept from the last play of every output."""
+        self.static_image = self.foreground_layer = self.drawn_state = None
+        for output in self.outputs:
+            output["static_image"] = output["foreground_layer"] = output["drawn_state"] = None
+
+    def render(self, scene, time, moving_mobjects):
+        state = self.frame_state(scene, moving_mobjects)
+        for _ in self.each_output():
+            # a hold, or updaters that moved nothing: the camera still has the frame
+            if state is None or state != self.drawn_state:
+                self.update_frame(scene, moving_mobjects)
+                self.drawn_state = state
+            # the encoder reads the frame before the next one is drawn, no copy needed
+            self.add_frame(self.camera.pixel_array)
+
+    def frame_state(self, scene, mobjects):
+        """drawn_state of the mobjects `render` draws over the static image."""
+        if getattr(self.camera, "image_mobjects_from_cameras", None):
+            # what the sub cameras see is not part of the state
+            return None
+        if not mobjects:
+            mobjects = list_update(scene.mobjects, scene.foreground_mobjects)
+        state = drawn_state(self.camera.get_mobjects_to_display(mobjects))
+        frame = getattr(self.camera, "frame", None)
+        if state is not None and frame is not None:
+            state.append(frame.points.tobytes())
+        return state
+
+    def freeze_current_frame(self, duration):
+        # CairoRenderer.play drew the frozen frame with the main camera only
+        super().freeze_current_frame(duration)
+        for output in self.outputs:
+            with self.drawing_to(output):
+                self.update_frame(self.scene, self.scene.moving_mobjects)
+                super().freeze_current_frame(duration)
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        for _ in self.each_output():
+            self.foreground_layer = None
+            # update_frame times the static image itself
+            super().save_static_frame_data(scene, static_mobjects)
+            if scene.static_foreground_mobjects:
+                with profiler.timed("rasterize"):
+                    self.foreground_layer = self.render_layer(
+                        scene, scene.static_foreground_mobjects)
+        return self.static_image
+
+    def render_layer(self, scene, mobjects):
+        """Rasterizes `mobjects` once into a premultiplied layer.
+
+        The mobjects are drawn over black and over white; the difference
+        between the two gives the coverage of every pixel.
+        """
+        camera = self.camera
+        canvas = np.zeros((camera.pixel_height, camera.pixel_width, 4), dtype=np.uint8)
+        canvas[:, :, 3] = 255
+        renders = []
+        for value in (0, 255):
+            canvas[:, :, :3] = value
+            camera.set_pixel_array(canvas)
+            camera.capture_mobjects(mobjects)
+            renders.append(camera.pixel_array[:, :, :3].astype(np.uint16))
+        over_black, over_white = renders
+        transparency = (over_white - over_black).max(axis=2, keepdims=True)
+
+        rows, cols = np.nonzero(transparency[:, :, 0] < 255)
+        if len(rows) == 0:
+            return None
+        y0, y1, x0, x1 = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+        return (y0, y1, x0, x1, over_black[y0:y1, x0:x1], transparency[y0:y1, x0:x1])
+
+    @contextlib.contextmanager
+    def sampling_images(self, scene, mobjects):
+        """Tells the mipmapped images how many rows they cover on this camera."""
+        if not mobjects:
+            mobjects = list_update(scene.mobjects, scene.foreground_mobjects)
+        images = [mob for mob in extract_mobject_family_members(mobjects)
+            if hasattr(mob, "screen_rows")]
+        if getattr(self.camera, "image_mobjects_from_cameras", None):
+            # zoomed sub cameras draw during this capture, at their own scale
+            images = []
+        # a moving camera's frame_height follows its frame
+        pixels_per_unit = self.camera.pixel_height / self.camera.frame_height
+        for image in images:
+            image.screen_rows = image.height * pixels_per_unit
+        try:
+            yield
+        finally:
+            # any other camera gets every pixel
+            for image in images:
+                image.screen_rows = None
+
+    def update_frame(self, scene, mobjects=None, *args, **kwargs):
+        # render sets it again when the frame is the one it asked for
+        self.drawn_state = None
+        with profiler.timed("rasterize"), self.sampling_images(scene, mobjects):
+            super().update_frame(scene, mobjects, *args, **kwargs)
+            if mobjects and self.foreground_layer is not None:
+                y0, y1, x0, x1, color, transparency = self.foreground_layer
+                region = self.camera.pixel_array[y0:y1, x0:x1, :3]
+                region[:] = np.minimum(color + (region * transparency + 127) // 255, 255)
+
+
+class DeckScene(PPTXScene):
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("renderer", DeckRenderer(
+            file_writer_class=DeckFileWriter,
+            camera_class=kwargs.get("camera_class", Camera),
+            skip_animations=kwargs.get("skip_animations", False)))
+        super().__init__(*args, **kwargs)
+        self.static_foreground_mobjects = []
+        self.animation_batches = []
+        self.unbatched_animations = []
+        if (stream_slides or extra_resolutions) and not config.disable_caching:
+            logger.warning("DECK_STREAM and DECK_RESOLUTIONS need --disable_caching: a play "
+                "found in manim's cache leaves a hole in the streamed segment and is not "
+                "written at the other sizes")
+
+    def render(self, *args, **kwargs):
+        super().render(*args, **kwargs)
+        if profiler.enabled:
+            profiler.finish(type(self).__name__)
+            profiler.write()
+
+    def play(self, *args, **kwargs):
+        with profiler.recording_play(args):
+            super().play(*args, **kwargs)
+
+    def release(self):
+        """Lets go of everything the scene kept from its construct: its
+        mobjects, the animations of its last play, which hold copies of them,
+        its updaters and the frames the renderer kept."""
+        self.clear()
+        self.animations = None
+        self.animation_batches = []
+        self.unbatched_animations = []
+        self.moving_mobjects = []
+        self.static_mobjects = []
+        self.static_foreground_mobjects = []
+        self.updaters = []
+        self.renderer.release()
+
+    def begin_animations(self):
+        super().begin_animations()
+        self.animation_batches, self.unbatched_animations = batch_animations(self.animations)
+
+    def update_to_time(self, t):
+        with profiler.timed("interpolate"):
+            # Scene.update_to_time, with the transforms of the play interpolated together
+            dt = t - self.last_t
+            self.last_t = t
+            for animation in self.animations:
+                animation.update_mobjects(dt)
+            for animation in self.unbatched_animations:
+                animation.interpolate(t / animation.run_time)
+            for batch in self.animation_batches:
+                batch.interpolate(t)
+            self.update_mobjects(dt)
+            self.update_meshes(dt)
+            self.update_self(dt)
+
+    def update_mobjects(self, dt):
+        if not profiler.enabled:
+            return super().update_mobjects(dt)
+        # swap in timed updaters for this update only
+        swapped = [(mob, mob.updaters) for mob in self.get_mobject_family_members() if mob.updaters]
+        for mob, updaters in swapped:
+            mob.updaters = [profiler.timed_updater(updater) for updater in updaters]
+        try:
+            super().update_mobjects(dt)
+        finally:
+            for mob, updaters in swapped:
+                mob.updaters = updaters
+
+    def wait(self, *args, **kwargs):
+        # Scene.wait goes through self.play, which already counts the animation;
+        # PPTXScene.wait would count it twice and shift every later slide
+        Scene.wait(self, *args, **kwargs)
+
+    def endSlide(self, *args, **kwargs):
+        super().endSlide(*args, **kwargs)
+        file_writer = self.renderer.file_writer
+        if getattr(file_writer, "streaming", False):
+            slide = self.slides[-1]
+            # the pptx takes the movies of slide["start"]:slide["end"]
+            slide["animations"] = [slide["start"], slide["end"]]
+            slide["start"] = file_writer.cut_segment()
+            # slides that wrote no frames get no movie
+            slide["end"] = slide["start"] + (file_writer.segments[-1] is not None)
+        if profiler.enabled:
+            profiler.end_section(self.constructing_scene(), self.currentSlide - 1)
+
+    def constructing_scene(self):
+        """Name of the scene whose construct is running; Slides runs them all."""
+        constructs = {}
+        for cls in type(self).__mro__:
+            construct = cls.__dict__.get("construct")
+            if hasattr(construct, "__code__"):
+                constructs.setdefault(construct.__code__, cls.__name__)
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_code in constructs:
+                return constructs[frame.f_code]
+            frame = frame.f_back
+        return type(self).__name__
+
+    def get_moving_and_static_mobjects(self, animations):
+        """Splits the scene into a static background, the moving mobjects and
+        a static foreground.
+
+        Manim treats everything drawn after the first moving mobject as moving;
+        the static mobjects drawn above every moving one are cached too, as a
+        layer composited over each frame.
+        """
+        self.static_foreground_mobjects = []
+        if self.updaters or self.always_update_mobjects:
+            return super().get_moving_and_static_mobjects(animations)
+
+        use_z_index = self.renderer.camera.use_z_index
+        all_mobjects = extract_mobject_family_members(
+            list_update(self.mobjects, self.foreground_mobjects),
+            use_z_index=use_z_index,
+            only_those_with_points=True,
+        )
+        moving_roots = [animation.mobject for animation in animations]
+        moving_roots += [mob for mob in self.get_mobject_family_members() if mob.updaters]
+        moving_roots += self.foreground_mobjects
+        moving = set(extract_mobject_family_members(moving_roots))
+
+        indices = [i for i, mob in enumerate(all_mobjects) if mob in moving]
+        if not indices:
+            return [], all_mobjects
+        first, last = indices[0], indices[-1]
+        self.static_foreground_mobjects = all_mobjects[last + 1:]
+        return all_mobjects[first:last + 1], all_mobjects[:first]
+
+
+class MagnifierCamera(MovingCamera):
+    """Zoomed camera that only draws what lies under its frame.
+
+    Mobjects outside of the frame are skipped and images are cropped to the
+    frame before they are resampled, instead of being resampled whole at the
+    zoomed scale. When nothing under the frame changed since the last capture,
+    the pixels of that capture are kept as they are.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.drawn_view = None
+        super().__init__(*args, **kwargs)
+
+    def reset_pixel_shape(self, new_height, new_width):
+        # MultiCamera asks for the same shape on every frame
+        if (new_height, new_width) != (self.pixel_height, self.pixel_width):
+            self.drawn_view = None
+            super().reset_pixel_shape(new_height, new_width)
+
+    def reset(self):
+        # cleared in capture_mobjects, once it knows the view changed
+        if self.drawn_view is None:
+            super().reset()
+        return self
+
+    def under_frame(self, mobject):
+        # bounding boxes, the frame of a zoomed scene is not rotated
+        low, high = mobject.points.min(axis=0), mobject.points.max(axis=0)
+        frame_low, frame_high = self.frame.points.min(axis=0), self.frame.points.max(axis=0)
+        return np.all(low[:2] <= frame_high[:2]) and np.all(high[:2] >= frame_low[:2])
+
+    def capture_mobjects(self, mobjects, **kwargs):
+        mobjects = [mob for mob in self.get_mobjects_to_display(mobjects, **kwargs)
+            if self.under_frame(mob)]
+        view = drawn_state(mobjects)
+        if view is not None:
+            view.append(self.frame.points.tobytes())
+        if view is not None and view == self.drawn_view:
+            return
+        self.drawn_view = None
+        self.reset()
+        super().capture_mobjects(mobjects, include_submobjects=False)
+        self.drawn_view = view
+
+    def display_image_mobject(self, image_mobject, pixel_array):
+        ul, ur, dl = self.points_to_pixel_coords(image_mobject, image_mobject.points[:3])
+        if ur[1] != ul[1] or dl[0] != ul[0] or ur[0] <= ul[0] or dl[1] <= ul[1]:
+            # rotated or flipped
+            return super().display_image_mobject(image_mobject, pixel_array)
+        x0, y0 = max(ul[0], 0), max(ul[1], 0)
+        x1, y1 = min(ur[0], self.pixel_width), min(dl[1], self.pixel_height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        # the source pixels under the visible part of the image
+        pixels = image_mobject.get_pixel_array()
+        scale_x = pixels.shape[1] / (ur[0] - ul[0])
+        scale_y = pixels.shape[0] / (dl[1] - ul[1])
+        box = ((x0 - ul[0]) * scale_x, (y0 - ul[1]) * scale_y,
+            (x1 - ul[0]) * scale_x, (y1 - ul[1]) * scale_y)
+        sub_image = Image.fromarray(np.asarray(pixels), mode="RGBA").resize(
+            (int(x1 - x0), int(y1 - y0)), resample=image_mobject.resampling_algorithm, box=box)
+
+        region = pixel_array[y0:y1, x0:x1]
+        region[:] = np.array(Image.alpha_composite(
+            Image.fromarray(region, mode=self.image_mode), sub_image))
+
+
+class MagnifiedScene(ZoomedScene):
+    """A ZoomedScene whose zoomed camera is a MagnifierCamera."""
+
+    def setup(self):
+        super().setup()
+        camera = MagnifierCamera(**self.zoomed_camera_config)
+        # after the camera is built, which would reshape a frame passed to it
+        camera.frame = self.zoomed_camera.frame
+        self.zoomed_camera = camera
+        self.zoomed_display.camera = camera
+        self.zoomed_display.pixel_array = camera.pixel_array
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("manim")
+pytest.importorskip("manim_pptx")
+
+import numpy as np
+from PIL import Image
+
+import assets
+from assets import CachedImageMobject, load_image
+
+
+@pytest.fixture
+def image_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "cache_dir", str(tmp_path / "cache"))
+    assets.asset_cache.clear()
+    pixels = np.zeros((40, 60, 4), dtype=np.uint8)
+    pixels[:, :, 0] = 200
+    pixels[:, :, 3] = 255
+    path = tmp_path / "image.png"
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+
+def test_load_image_shares_cached_pixels(image_path):
+    image = load_image(image_path)
+    assert isinstance(image, CachedImageMobject)
+    assert image.screen_rows is None
+    assert image.get_pixel_array().shape == (40, 60, 4)
+    assert not image.pixel_array.flags.writeable
+    assert load_image(image_path).pixel_array is image.pixel_array
+
+
+def test_invert_applies_to_a_copy(image_path):
+    shared = load_image(image_path)
+    inverted = load_image(image_path, invert=True)
+    assert inverted.pixel_array is not shared.pixel_array
+    assert inverted.pixel_array[0, 0, 0] == 55
+    assert shared.pixel_array[0, 0, 0] == 200
@@ -0,0 +1,388 @@
+"""Parsed Tex mobjects for the presentation.
+
+Manim caches the compiled SVG of every tex string on disk, but every Tex and
+MathTex still parses that SVG into a fresh mobject tree. The deck repeats the
+same strings a lot, so parsed mobjects are kept in memory and handed out as
+copies.
+
+Before a render, prepare_tex compiles every tex string the deck will need in a
+single multi-page LaTeX run and drops the pages into manim's tex directory, so
+a cold build does not spawn latex and dvisvgm once per string.
+"""
+from manim import MathTex, SingleStringMathTex, Tex, config, logger
+from manim.utils.tex_file_writing import compile_tex, generate_tex_file, tex_hash, \
+    tex_to_svg_file
+
+import ast
+import concurrent.futures
+import inspect
+import os
+import time
+
+from profiling import profiler
+
+
+def key_value(value):
+    # tex templates compare by their body, everything else by repr
+    if hasattr(value, "body"):
+        return value.body
+    if isinstance(value, dict):
+        return repr(sorted((k, key_value(v)) for k, v in value.items()))
+    return repr(value)
+
+
+class TexCache:
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.build_time = 0
+        self.saved_time = 0
+
+    def get(self, tex_class, tex_strings, kwargs):
+        kwargs.setdefault("tex_template", config["tex_template"])
+        key = (tex_class.__name__, tex_strings,
+            tuple(sorted((k, key_value(v)) for k, v in kwargs.items())))
+        if key in self.entries:
+            self.hits += 1
+            mobject, build_time = self.entries[key]
+            start = time.perf_counter()
+            mobject = mobject.copy()
+            self.saved_time += build_time - (time.perf_counter() - start)
+            return mobject
+
+        self.misses += 1
+        start = time.perf_counter()
+        mobject = tex_class(*tex_strings, **kwargs)
+        build_time = time.perf_counter() - start
+        self.build_time += build_time
+        profiler.add("tex", build_time)
+        self.entries[key] = (mobject, build_time)
+        return mobject.copy()
+
+    def summary(self):
+        return "Tex cache: {} hits, {} misses, {:.2f}s building, ~{:.2f}s saved".format(
+            self.hits, self.misses, self.build_time, self.saved_time)
+
+    def clear(self):
+        self.entries.clear()
+
+
+tex_cache = TexCache()
+
+
+def tex(*tex_strings, **kwargs):
+    return tex_cache.get(Tex, tex_strings, kwargs)
+
+
+def math_tex(*tex_strings, **kwargs):
+    return tex_cache.get(MathTex, tex_strings, kwargs)
+
+
+# calls that are safe to evaluate while looking for tex strings
+pure_builtins = {"dict", "enumerate", "float", "int", "len", "list", "max", "min", "range",
+    "reversed", "sorted", "str", "tuple", "zip"}
+string_methods = {"format", "join", "lower", "replace", "split", "strip", "upper"}
+# keyword arguments that change the compiled svg
+tex_options = ("arg_separator", "substrings_to_isolate", "tex_environment",
+    "tex_template", "tex_to_color_map")
+
+
+class TexCollector:
+    """Finds the tex and math_tex calls of a module without running it.
+
+    Arguments are evaluated where that is safe: literals, module constants,
+    string formatting and helpers that only call such things. Assignments and
+    for loops are followed, and calls to the module's own functions and classes
+    are followed into their bodies with the arguments they are given, so labels
+    built in a loop such as r"G_{}".format(index) are found too.
+    """
+
+    max_depth = 5
+
+    def __init__(self, module):
+        self.namespace = vars(module)
+        tree = ast.parse(inspect.getsource(module))
+        self.definitions = {node.name: node for node in tree.body
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef))}
+        self.pure = {name for name, node in self.definitions.items()
+            if isinstance(node, ast.FunctionDef) and self.is_pure(node)}
+        self.followed = set()
+        self.calls = []
+        self.visit(tree.body, {}, 0)
+
+    def is_pure(self, node):
+        return all(not isinstance(n.func, ast.Name) or n.func.id in pure_builtins
+            for n in ast.walk(node) if isinstance(n, ast.Call))
+
+    def is_safe(self, node):
+        for n in ast.walk(node):
+            if isinstance(n, (ast.Lambda, ast.NamedExpr)):
+                return False
+            if not isinstance(n, ast.Call):
+                continue
+            if isinstance(n.func, ast.Name):
+                if n.func.id not in pure_builtins and n.func.id not in self.pure:
+                    return False
+            elif not (isinstance(n.func, ast.Attribute) and n.func.attr in string_methods):
+                return False
+        return True
+
+    def evaluate(self, node, scope):
+        if not self.is_safe(node):
+            raise ValueError("not evaluated")
+        return eval(compile(ast.Expression(node), "<tex>", "eval"), self.namespace, scope)
+
+    def bind(self, target, value, scope):
+        if isinstance(target, ast.Name):
+            scope[target.id] = value
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element, element_value in zip(target.elts, value):
+                self.bind(element, element_value, scope)
+
+    def unbind(self, target, scope):
+        for n in ast.walk(target):
+            if isinstance(n, ast.Name):
+                scope.pop(n.id, None)
+
+    def visit(self, statements, scope, depth):
+        for statement in statements:
+            if isinstance(statement, ast.ClassDef):
+                self.visit(statement.body, {}, depth)
+            elif isinstance(statement, ast.FunctionDef):
+                self.visit_function(statement, {}, depth)
+            elif isinstance(statement, ast.For):
+                self.scan(statement.iter, scope, depth)
+                try:
+                    values = list(self.evaluate(statement.iter, scope))
+                except Exception:
+                    self.unbind(statement.target, scope)
+                    self.visit(statement.body, scope, depth)
+                else:
+                    for value in values:
+                        self.bind(statement.target, value, scope)
+                        self.visit(statement.body, scope, depth)
+                self.visit(statement.orelse, scope, depth)
+            elif isinstance(statement, ast.If):
+                self.scan(statement.test, scope, depth)
+                try:
+                    taken = [statement.body if self.evaluate(statement.test, scope)
+                        else statement.orelse]
+                except Exception:
+                    taken = [statement.body, statement.orelse]
+                for branch in taken:
+                    self.visit(branch, scope, depth)
+            elif isinstance(statement, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+                if statement.value is None:
+                    continue
+                self.scan(statement.value, scope, depth)
+                if isinstance(statement, ast.Assign):
+                    targets = statement.targets
+                else:
+                    targets = [statement.target]
+                value = statement.value
+                if isinstance(statement, ast.AugAssign):
+                    value = ast.BinOp(ast.Name(getattr(statement.target, "id", ""), ast.Load()),
+                        statement.op, value)
+                try:
+                    value = self.evaluate(value, scope)
+                except Exception:
+                    for target in targets:
+                        self.unbind(target, scope)
+                else:
+                    for target in targets:
+                        self.bind(target, value, scope)
+            else:
+                # if, while, with, try, expressions: scan the expressions,
+                # visit every branch
+                for field, value in ast.iter_fields(statement):
+                    if isinstance(value, ast.expr):
+                        self.scan(value, scope, depth)
+                    elif isinstance(value, list):
+                        nested = [v for v in value if isinstance(v, ast.stmt)]
+                        for v in value:
+                            if isinstance(v, ast.excepthandler):
+                                nested += v.body
+                            elif isinstance(v, ast.withitem):
+                                self.scan(v.context_expr, scope, depth)
+                        self.visit(nested, scope, depth)
+
+    def visit_function(self, node, scope, depth):
+        # unknown parameters stay unbound, defaults are used when known
+        arguments = node.args.posonlyargs + node.args.args
+        defaults = dict(zip([a.arg for a in arguments[-len(node.args.defaults):]],
+            node.args.defaults)) if node.args.defaults else {}
+        defaults.update((a.arg, d) for a, d in zip(node.args.kwonlyargs, node.args.kw_defaults)
+            if d is not None)
+        function_scope = {}
+        for name, default in defaults.items():
+            if name not in scope:
+                try:
+                    function_scope[name] = self.evaluate(default, {})
+                except Exception:
+                    pass
+        function_scope.update(scope)
+        self.visit(node.body, function_scope, depth)
+
+    def scan(self, expression, scope, depth):
+        for node in ast.walk(expression):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+                continue
+            name = node.func.id
+            if self.namespace.get(name) in (tex, math_tex):
+                self.record(node, scope)
+            elif name in self.definitions and name not in self.pure and depth < self.max_depth:
+                self.follow(self.definitions[name], node, scope, depth + 1)
+
+    def call_arguments(self, node, scope):
+        args = []
+        for arg in node.args:
+            if isinstance(arg, ast.Starred):
+                args.extend(self.evaluate(arg.value, scope))
+            else:
+                args.append(self.evaluate(arg, scope))
+        return args
+
+    def record(self, node, scope):
+        try:
+            tex_strings = tuple(self.call_arguments(node, scope))
+            kwargs = {k.arg: self.evaluate(k.value, scope) for k in node.keywords
+                if k.arg in tex_options}
+        except Exception:
+            return
+        tex_class = MathTex if self.namespace[node.func.id] is math_tex else Tex
+        self.calls.append((tex_class, tex_strings, kwargs))
+
+    def follow(self, definition, node, scope, depth):
+        # bind what can be evaluated of the call to the definition's parameters
+        if isinstance(definition, ast.ClassDef):
+            inits = [n for n in definition.body
+                if isinstance(n, ast.FunctionDef) and n.name == "__init__"]
+            if not inits:
+                return
+            function, skip = inits[0], 1
+        else:
+            function, skip = definition, 0
+        parameters = [a.arg for a in function.args.posonlyargs + function.args.args][skip:]
+        bound = {}
+        for parameter, arg in zip(parameters, node.args):
+            if isinstance(arg, ast.Starred):
+                break
+            try:
+                bound[parameter] = self.evaluate(arg, scope)
+            except Exception:
+                pass
+        for keyword in node.keywords:
+            if keyword.arg is not None:
+                try:
+                    bound[keyword.arg] = self.evaluate(keyword.value, scope)
+                except Exception:
+                    pass
+        key = (definition.name, repr(sorted(bound.items())))
+        if key not in self.followed:
+            self.followed.add(key)
+            self.visit_function(function, bound, depth)
+
+
+def tex_expressions(tex_class, tex_strings, kwargs):
+    """(expression, environment, template) of every svg `tex_class` compiles."""
+    environment = kwargs.get("tex_environment",
+        "center" if issubclass(tex_class, Tex) else "align*")
+    template = kwargs.get("tex_template") or config["tex_template"]
+    separator = kwargs.get("arg_separator", "" if issubclass(tex_class, Tex) else " ")
+    # split the strings the way MathTex does, without compiling anything
+    splitter = tex_class.__new__(tex_class)
+    splitter.substrings_to_isolate = kwargs.get("substrings_to_isolate") or []
+    splitter.tex_to_color_map = kwargs.get("tex_to_color_map") or {}
+    pieces = splitter._break_up_tex_strings(tex_strings)
+    modifier = SingleStringMathTex.__new__(SingleStringMathTex)
+    return [(modifier._get_modified_expression(expression), environment, template)
+        for expression in [separator.join(pieces)] + pieces]
+
+
+def batch_document(jobs, template):
+    # one standalone page per expression
+    prefix, suffix = template.body.split(template.placeholder_text)
+    documentclass = template.documentclass.replace("[", "[multi,", 1)
+    pages = []
+    for expression, environment, _ in jobs:
+        code = template.get_texcode_for_expression_in_env(expression, environment)
+        pages.append("\\begin{standalone}\n" + code[len(prefix):len(code) - len(suffix)]
+            + "\n\\end{standalone}\n")
+    return prefix.replace(template.documentclass, documentclass, 1) + "".join(pages) + suffix
+
+
+def compile_batch(jobs, template):
+    """Compiles `jobs` in one LaTeX run, returns the ones that did not make it."""
+    if "standalone" not in template.documentclass or "[" not in template.documentclass:
+        return jobs
+    tex_dir = config.get_dir("tex_dir")
+    tex_dir.mkdir(parents=True, exist_ok=True)
+    document = batch_document(jobs, template)
+    tex_file = tex_dir / "batch-{}.tex".format(tex_hash(document))
+    tex_file.write_text(document, encoding="utf-8")
+    try:
+        dvi_file = compile_tex(tex_file, template.tex_compiler, template.output_format)
+    except ValueError:
+        logger.warning("Batched LaTeX run failed, compiling the strings one by one")
+        return jobs
+
+    pattern = tex_file.with_name(tex_file.stem + "-%4p.svg")
+    os.system(" ".join([
+        "dvisvgm",
+        "--pdf" if template.output_format == ".pdf" else "",
+        "-p 1-",
+        '"{}"'.format(dvi_file.as_posix()),
+        "-n",
+        "-v 0",
+        '-o "{}"'.format(pattern.as_posix()),
+        ">",
+        os.devnull,
+    ]))
+    left = []
+    for page, job in enumerate(jobs, 1):
+        page_file = tex_file.with_name("{}-{:04d}.svg".format(tex_file.stem, page))
+        if not page_file.exists():
+            left.append(job)
+            continue
+        expression_tex = generate_tex_file(*job)
+        os.replace(page_file, expression_tex.with_suffix(".svg"))
+        # compile_tex only checks that the dvi exists, Tex reads the svg
+        expression_tex.with_suffix(template.output_format).touch()
+    return left
+
+
+def prepare_tex(module, jobs=None):
+    """Compiles the tex strings of `module` that are not in manim's tex cache yet."""
+    tex_dir = config.get_dir("tex_dir")
+    missing = {}
+    for call in TexCollector(module).calls:
+        for expression, environment, template in tex_expressions(*call):
+            code = template.get_texcode_for_expression_in_env(expression, environment)
+            if not (tex_dir / (tex_hash(code) + ".svg")).exists():
+                missing[code] = (expression, environment, template)
+    if not missing:
+        return
+
+    by_template = {}
+    for job in missing.values():
+        by_template.setdefault(job[2].body, []).append(job)
+    left = []
+    start = time.perf_counter()
+    for template_jobs in by_template.values():
+        left += compile_batch(template_jobs, template_jobs[0][2])
+    # whatever the batch could not do, in parallel
+    with concurrent.futures.ThreadPoolExecutor(jobs or os.cpu_count()) as pool:
+        for job, result in zip(left, pool.map(compile_single, left)):
+            if result is not None:
+                logger.warning("Could not compile %s: %s", job[0], result)
+    logger.info("Compiled %d tex strings in %.2fs", len(missing), time.perf_counter() - start)
+
+
+def compile_single(job):
+    # the scene reports the error properly when it gets to the string
+    try:
+        tex_to_svg_file(*job)
+    except Exception as error:
+        return error